@@ -0,0 +1,148 @@
+"""
+Background writer for shelter activity logs
+
+Routes queue log entries instead of inserting them inside their own
+transaction. A single writer thread drains the queue and inserts the entries
+with executemany, either every `flush_interval` seconds or as soon as
+`batch_size` entries are waiting.
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+class ActivityLogWriter:
+    def __init__(self, connection_factory, flush_interval=0.2, batch_size=200):
+        self.connection_factory = connection_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        atexit.register(self.close)
+
+    @property
+    def depth(self):
+        """Number of entries waiting to be written"""
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'queue_depth': self.depth,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors
+        }
+
+    def log(self, pet_id, user_id, action, description=None):
+        """Queue an activity log entry
+
+        The timestamp is taken now (UTC, like CURRENT_TIMESTAMP) so entries
+        keep their real order however long they wait in the queue.
+        """
+        timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        self._queue.put((pet_id, user_id, action, description, timestamp))
+        self._ensure_started()
+
+    def flush(self, timeout=5.0):
+        """Block until every queued entry has been written, for at most `timeout` seconds
+
+        Returns False if entries were still waiting when the timeout expired.
+        """
+        if self._queue.unfinished_tasks:
+            # Restarts the writer if it has died
+            self._ensure_started()
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """Write the remaining entries and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping.set()
+        # Joined outside the lock, which the thread takes on its way out
+        thread.join()
+        with self._lock:
+            self._stopping.clear()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='activity-log-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        try:
+            conn = self.connection_factory()
+            try:
+                while not (self._stopping.is_set() and self._queue.empty()):
+                    batch = self._next_batch()
+                    if batch:
+                        self._write(conn, batch)
+            finally:
+                conn.close()
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Activity log writer stopped: {e}")
+        finally:
+            # The next log() or flush() starts a new writer for what is left
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _next_batch(self):
+        """Wait for an entry, then collect more until the interval or batch size is reached"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0 and not self._stopping.is_set():
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Past the deadline: take only what is already queued
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        try:
+            conn.executemany('''
+                INSERT INTO activity_logs (pet_id, user_id, action, description, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', batch)
+            conn.commit()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.errors += 1
+            print(f"❌ Error writing {len(batch)} activity log entries: {e}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
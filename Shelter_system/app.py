@@ -1,24 +1,78 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, flash, session, g,
+                   make_response, Response, stream_with_context)
 import sqlite3
 import os
 import hashlib
-from datetime import datetime
+import base64
+import io
+from datetime import datetime, timezone
 from chatbot import ShelterChatbot
+from catalog import (AvailableCatalog, PETS_WITH_IMAGE_QUERY, BOOL_FIELDS, AGE_BUCKETS,
+                     serialize_pet, traits_mask)
+from cache import LRUCache
+from models import connect_db, get_pet_counts, get_data_version, fts_query
+from activity_log import ActivityLogWriter
+from migrations import migrate
+from bulk_import import import_pets, read_rows
+from instrumentation import Metrics, TimedConnection, SlowQueryLog, RequestProfiler
 from flask_cors import CORS
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'shelter-system-secret-key-2024'
 app.config['DATABASE'] = 'instance/shelter.db'
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
+app.config['PETS_PER_PAGE'] = 24
+app.config['API_PAGE_SIZE'] = 100
+app.config['API_MAX_PAGE_SIZE'] = 500
+app.config['STREAM_BATCH_SIZE'] = 500
+app.config['CHATBOT_CACHE_SIZE'] = 256
+app.config['CHATBOT_CACHE_TTL'] = 60
+app.config['CHATBOT_MAX_BATCH'] = 50
+app.config['PET_DETAIL_CACHE_SIZE'] = 1024
+app.config['PET_DETAIL_CACHE_TTL'] = 300
+app.config['ADOPTION_BATCH_MAX'] = 500
+app.config['SQL_QUERY_BUDGET'] = 50
+# Opt-in diagnostics: a file path turns on the slow query log, a secret
+# token turns on per-request profiling (X-Profile header or ?_profile=)
+app.config['SLOW_QUERY_LOG'] = os.environ.get('SHELTER_SLOW_QUERY_LOG')
+app.config['SLOW_QUERY_MS'] = int(os.environ.get('SHELTER_SLOW_QUERY_MS', 100))
+app.config['PROFILE_TOKEN'] = os.environ.get('SHELTER_PROFILE_TOKEN')
 
-# Initialize chatbot and CORS
-chatbot = ShelterChatbot()
-CORS(app)
+metrics = Metrics()
+metrics.init_app(app)
+slow_query_log = SlowQueryLog()
+slow_query_log.init_app(app)
+RequestProfiler().init_app(app)
 
 def get_db_connection():
-    conn = sqlite3.connect(app.config['DATABASE'])
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get the database connection for the current request, opening it on first use"""
+    if 'db' not in g:
+        g.db = connect_db(app.config['DATABASE'], factory=TimedConnection)
+        slow_query_log.track_connection(g.db)
+    return g.db
+
+@app.teardown_appcontext
+def close_db_connection(exception):
+    """Close the request's database connection, discarding any uncommitted work"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        conn.close()
+
+# Initialize the catalog snapshot, caches, chatbot, activity log writer and CORS
+catalog = AvailableCatalog()
+# Encoded /api/adoption/pets/<id> bodies by (pet id, data version)
+pet_detail_cache = LRUCache(maxsize=app.config['PET_DETAIL_CACHE_SIZE'],
+                            ttl=app.config['PET_DETAIL_CACHE_TTL'])
+chatbot = ShelterChatbot(connection_factory=get_db_connection, catalog=catalog,
+                         cache_size=app.config['CHATBOT_CACHE_SIZE'],
+                         cache_ttl=app.config['CHATBOT_CACHE_TTL'])
+activity_log = ActivityLogWriter(lambda: connect_db(app.config['DATABASE']))
+CORS(app)
+
+def notify_pets_changed():
+    """Free in-process caches after a committed write to pets or pet_images"""
+    chatbot.invalidate_cache()
+    pet_detail_cache.invalidate()
 
 def hash_password(password):
     """Hash a password for storing."""
@@ -29,11 +83,11 @@ def check_password(hashed_password, user_password):
     return hashed_password == hashlib.sha256(user_password.encode()).hexdigest()
 
 def init_db():
-    """Initialize database with required tables"""
+    """Initialize database with required tables and apply pending migrations"""
     os.makedirs('instance', exist_ok=True)
     os.makedirs('static/uploads', exist_ok=True)
     
-    conn = get_db_connection()
+    conn = connect_db(app.config['DATABASE'])
     
     # Users table
     conn.execute('''
@@ -120,6 +174,9 @@ def init_db():
         print("✅ Default admin user created: username='admin', password='admin123'")
     
     conn.commit()
+    
+    # Apply versioned schema changes (indexes, triggers, new tables)
+    migrate(conn)
     conn.close()
 
 def login_required(f):
@@ -134,12 +191,124 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def conditional_on_data_version(f):
+    """Decorator adding data-version ETag/Last-Modified validators to catalog reads and answering 304"""
+    from functools import wraps
+    
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        version, updated_at = get_data_version(get_db_connection())
+        # Lets get_catalog() reuse the version instead of reading it again
+        g.data_version = version
+        etag = f'v{version}'
+        if wants_ndjson():
+            # Same URL, different representation: it needs its own validator
+            etag += '-ndjson'
+        last_modified = datetime.strptime(updated_at, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+        
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (request.if_modified_since is not None
+                            and last_modified <= request.if_modified_since)
+        
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        response.vary.add('Accept')
+        return response
+    return decorated_function
+
+def wants_ndjson():
+    """Whether the client asked for a streamed NDJSON response"""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    return best == 'application/x-ndjson'
+
+def encode_cursor(created_at, pet_id):
+    """Build the opaque cursor pointing just past the given pet"""
+    # A missing created_at sorts as '', below every timestamp, as in the catalog keys
+    return base64.urlsafe_b64encode(f'{created_at or ""}|{pet_id}'.encode()).decode()
+
+def decode_cursor(cursor):
+    """Return (created_at, pet_id) from a cursor, raising ValueError if malformed"""
+    try:
+        created_at, pet_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return created_at, int(pet_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+def get_page_args():
+    """Read (limit, after) from ?limit=&after=; limit is None when the client asked for neither"""
+    limit = request.args.get('limit', type=int)
+    after = request.args.get('after')
+    if limit is None and not after:
+        return None, None
+    if limit is None:
+        limit = app.config['API_PAGE_SIZE']
+    limit = min(max(limit, 1), app.config['API_MAX_PAGE_SIZE'])
+    return limit, decode_cursor(after) if after else None
+
+def paged_response(items, limit, next_cursor):
+    """Return a bare JSON list for unpaginated requests, or a page envelope"""
+    if limit is None:
+        return jsonify(items)
+    return jsonify({'results': items, 'next': next_cursor})
+
+def format_application_id(application_id):
+    """Public id of an adoption application row"""
+    return f'SHELTER-APP-{application_id}'
+
+def parse_application_id(application_id):
+    """Row id of a SHELTER-APP-<n> application id, or None for ids issued elsewhere"""
+    prefix = 'SHELTER-APP-'
+    if isinstance(application_id, str) and application_id.startswith(prefix) \
+            and application_id[len(prefix):].isdigit():
+        return int(application_id[len(prefix):])
+    return None
+
+# Decide a pet's pending applications. The applicant is named by shelter
+# application id or email; an approval approves theirs and rejects every
+# other pending application for the pet, a rejection only rejects theirs
+DECIDE_APPLICATIONS = '''
+    UPDATE adoption_applications
+    SET status = CASE WHEN id = :application OR applicant_email = :email
+                      THEN :status ELSE 'rejected' END
+    WHERE pet_id = :pet_id AND status = 'pending'
+      AND (:status = 'approved' OR id = :application OR applicant_email = :email)
+'''
+
+def application_decision(pet_id, status, application_id, applicant_email):
+    """DECIDE_APPLICATIONS parameters, or None when an approval names no applicant"""
+    application = parse_application_id(application_id)
+    if status == 'approved' and application is None and not applicant_email:
+        return None
+    return {'pet_id': pet_id, 'status': status, 'application': application,
+            'email': applicant_email or None}
+
+def get_catalog():
+    """Get the available catalog snapshot matching the database's data version"""
+    return catalog.get(get_db_connection(), g.get('data_version'))
+
+def catalog_page_response(snapshot, items, limit, after):
+    """Serve one keyset page of snapshot items, newest first"""
+    page, last = snapshot.page(items, limit, after)
+    return paged_response(list(page), limit, encode_cursor(*last) if last else None)
+
 def get_current_user():
     """Get current user from session"""
     if 'user_id' in session:
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-        conn.close()
         return dict(user) if user else None
     return None
 
@@ -153,61 +322,113 @@ def api_adoption_test():
         'timestamp': datetime.now().isoformat()
     })
 
+def stream_adoption_pets():
+    """Stream the available catalog as NDJSON, one pet per line, STREAM_BATCH_SIZE pets at a time"""
+    pets = get_catalog().pets
+    batch_size = app.config['STREAM_BATCH_SIZE']
+    
+    def generate():
+        for start in range(0, len(pets), batch_size):
+            yield ''.join(app.json.dumps(pet) + '\n' for pet in pets[start:start + batch_size])
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/adoption/pets', methods=['GET'])
+@conditional_on_data_version
 def api_adoption_pets():
-    """API: Get all available pets for adoption system"""
+    """API: Get available pets for adoption system (paged with ?limit=&after=, NDJSON with ?stream=1)"""
+    if wants_ndjson():
+        return stream_adoption_pets()
+    
     try:
-        conn = get_db_connection()
+        limit, after = get_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        snapshot = get_catalog()
+        return catalog_page_response(snapshot, snapshot.pets, limit, after)
         
-        # Get available pets with shelter information
-        pets = conn.execute('''
-            SELECT p.*, u.full_name as shelter_name, u.email as shelter_email
-            FROM pets p 
-            LEFT JOIN users u ON p.created_by = u.id 
-            WHERE p.status = "available"
-            ORDER BY p.created_at DESC
-        ''').fetchall()
-        
-        # Get primary images for each pet
-        pets_with_images = []
-        for pet in pets:
-            pet_dict = dict(pet)
-            
-            # Get primary image
-            primary_image = conn.execute(
-                'SELECT image_url FROM pet_images WHERE pet_id = ? AND is_primary = 1 LIMIT 1',
-                (pet_dict['id'],)
-            ).fetchone()
-            
-            if primary_image:
-                pet_dict['primary_image'] = primary_image['image_url']
-            else:
-                # Get any image if no primary
-                any_image = conn.execute(
-                    'SELECT image_url FROM pet_images WHERE pet_id = ? LIMIT 1',
-                    (pet_dict['id'],)
-                ).fetchone()
-                pet_dict['primary_image'] = any_image['image_url'] if any_image else None
-            
-            # Convert SQLite integers to Python booleans
-            bool_fields = ['vaccinated', 'spayed_neutered', 'microchipped', 
-                          'good_with_kids', 'good_with_pets', 'good_with_dogs', 'good_with_cats']
-            for field in bool_fields:
-                pet_dict[field] = bool(pet_dict[field]) if field in pet_dict else False
-            
-            pets_with_images.append(pet_dict)
+    except Exception as e:
+        print(f"Error in adoption pets API: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/adoption/pets/match', methods=['GET'])
+@conditional_on_data_version
+def api_adoption_pets_match():
+    """API: Get available pets having every trait in ?traits= (comma separated)"""
+    fields = [field.strip() for field in request.args.get('traits', '').split(',') if field.strip()]
+    if not fields:
+        return jsonify({'error': f"traits is required, any of: {', '.join(BOOL_FIELDS)}"}), 400
+    try:
+        mask = traits_mask(fields)
+        limit, after = get_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # The subquery only reads index entries, so rows that do not match
+        # are never loaded
+        query = PETS_WITH_IMAGE_QUERY + '''
+            WHERE p.id IN (SELECT id FROM pets WHERE status = "available" AND (traits & ?) = ?)
+        '''
+        params = [mask, mask]
+        if after:
+            query += " AND (COALESCE(p.created_at, ''), p.id) < (?, ?)"
+            params.extend(after)
+        query += ' ORDER BY p.created_at DESC, p.id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit + 1)
         
-        conn.close()
-        return jsonify(pets_with_images)
+        rows = get_db_connection().execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return paged_response([serialize_pet(row) for row in rows], limit, next_cursor)
         
     except Exception as e:
-        print(f"Error in adoption pets API: {e}")
+        print(f"Error in adoption pets match API: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/adoption/facets', methods=['GET'])
+@conditional_on_data_version
+def api_adoption_facets():
+    """API: Counts of available pets per species, gender, energy level, age bucket and trait"""
+    equals = {field: request.args[field] for field in ('species', 'gender', 'energy_level')
+              if request.args.get(field)}
+    if request.args.get('age'):
+        equals['age'] = request.args.get('age', type=int)
+        if equals['age'] is None:
+            return jsonify({'error': 'age must be a whole number'}), 400
+    try:
+        bucket = request.args.get('age_bucket') or None
+        if bucket and bucket not in dict(AGE_BUCKETS):
+            raise ValueError(f"age_bucket must be one of: {', '.join(name for name, _ in AGE_BUCKETS)}")
+        traits = traits_mask([field.strip() for field in request.args.get('traits', '').split(',')
+                              if field.strip()])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        return jsonify(get_catalog().facets(equals, request.args.get('breed'), bucket, traits))
+        
+    except Exception as e:
+        print(f"Error in adoption facets API: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/adoption/pets/<int:pet_id>', methods=['GET'])
+@conditional_on_data_version
 def api_adoption_pet_detail(pet_id):
     """API: Get specific pet details for adoption"""
+    key = (pet_id, g.data_version)
+    body = pet_detail_cache.get(key)
+    if body is not None:
+        return Response(body, mimetype='application/json')
+    
     try:
+        generation = pet_detail_cache.generation
         conn = get_db_connection()
         
         # Get pet details
@@ -219,10 +440,9 @@ def api_adoption_pet_detail(pet_id):
         ''', (pet_id,)).fetchone()
         
         if not pet:
-            conn.close()
             return jsonify({'error': 'Pet not found'}), 404
         
-        pet_dict = dict(pet)
+        pet_dict = serialize_pet(pet)
         
         # Get all images
         images = conn.execute(
@@ -231,19 +451,53 @@ def api_adoption_pet_detail(pet_id):
         ).fetchall()
         pet_dict['images'] = [dict(img) for img in images]
         
-        # Convert boolean fields
-        bool_fields = ['vaccinated', 'spayed_neutered', 'microchipped', 
-                      'good_with_kids', 'good_with_pets', 'good_with_dogs', 'good_with_cats']
-        for field in bool_fields:
-            pet_dict[field] = bool(pet_dict[field]) if field in pet_dict else False
-        
-        conn.close()
-        return jsonify(pet_dict)
+        response = jsonify(pet_dict)
+        pet_detail_cache.set(key, response.get_data(), generation)
+        return response
         
     except Exception as e:
         print(f"Error in adoption pet detail API: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/adoption/changes', methods=['GET'])
+@conditional_on_data_version
+def api_adoption_changes():
+    """API: Get pet changes after sequence number ?since= for incremental sync"""
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', app.config['API_PAGE_SIZE'], type=int), 1),
+                app.config['API_MAX_PAGE_SIZE'])
+    
+    try:
+        conn = get_db_connection()
+        latest_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM pet_changes').fetchone()[0]
+        changes = conn.execute(
+            'SELECT * FROM pet_changes WHERE seq > ? ORDER BY seq LIMIT ?', (since, limit + 1)
+        ).fetchall()
+        has_more = len(changes) > limit
+        changes = [dict(change) for change in changes[:limit]]
+        
+        pets = {}
+        pet_ids = {change['pet_id'] for change in changes}
+        if pet_ids:
+            placeholders = ','.join('?' * len(pet_ids))
+            rows = conn.execute(
+                PETS_WITH_IMAGE_QUERY + f' WHERE p.id IN ({placeholders})', list(pet_ids)
+            ).fetchall()
+            pets = {row['id']: serialize_pet(row) for row in rows}
+        for change in changes:
+            change['pet'] = pets.get(change['pet_id'])
+        
+        return jsonify({
+            'changes': changes,
+            'last_seq': changes[-1]['seq'] if changes else since,
+            'latest_seq': latest_seq,
+            'has_more': has_more
+        })
+        
+    except Exception as e:
+        print(f"Error in adoption changes API: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/adoption/update-status', methods=['POST'])
 def api_adoption_update_status():
     """API: Update adoption status from Django system"""
@@ -264,18 +518,21 @@ def api_adoption_update_status():
         
         conn = get_db_connection()
         
+        decision = application_decision(pet_id, status, application_id, data.get('applicant_email'))
+        if decision is None:
+            return jsonify({'error': 'An approval needs the applicant_email or a shelter application_id'}), 400
+        
         if status == 'approved':
             # Mark pet as adopted in your shelter system
             conn.execute('UPDATE pets SET status = "adopted" WHERE id = ?', (pet_id,))
-            
-            # Log the adoption activity
-            conn.execute('''
-                INSERT INTO activity_logs (pet_id, user_id, action, description)
-                VALUES (?, 1, 'adopted', ?)
-            ''', (pet_id, f'Pet {pet_name} adopted by {applicant_name} via application {application_id}'))
+            conn.execute(DECIDE_APPLICATIONS, decision)
             
             conn.commit()
-            conn.close()
+            notify_pets_changed()
+            
+            # Log the adoption activity
+            activity_log.log(pet_id, 1, 'adopted',
+                             f'Pet {pet_name} adopted by {applicant_name} via application {application_id}')
             
             print(f"✅ Pet {pet_id} ({pet_name}) marked as ADOPTED - Application: {application_id}")
             
@@ -287,14 +544,12 @@ def api_adoption_update_status():
             })
             
         elif status == 'rejected':
-            # Log the rejection (pet remains available)
-            conn.execute('''
-                INSERT INTO activity_logs (pet_id, user_id, action, description)
-                VALUES (?, 1, 'rejection', ?)
-            ''', (pet_id, f'Adoption application {application_id} for {pet_name} from {applicant_name} rejected'))
-            
+            conn.execute(DECIDE_APPLICATIONS, decision)
             conn.commit()
-            conn.close()
+            
+            # Log the rejection (pet remains available)
+            activity_log.log(pet_id, 1, 'rejection',
+                             f'Adoption application {application_id} for {pet_name} from {applicant_name} rejected')
             
             print(f"❌ Adoption REJECTED - Pet: {pet_id} ({pet_name}), Application: {application_id}")
             
@@ -311,6 +566,111 @@ def api_adoption_update_status():
         print(f"❌ Error updating adoption status: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/adoption/update-status/batch', methods=['POST'])
+def api_adoption_update_status_batch():
+    """API: Apply many adoption decisions from Django in one transaction, one result per decision"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Send a JSON object with a decisions list'}), 400
+    decisions = data.get('decisions')
+    if not isinstance(decisions, list):
+        return jsonify({'error': 'decisions must be a list'}), 400
+    if len(decisions) > app.config['ADOPTION_BATCH_MAX']:
+        return jsonify({'error': f"At most {app.config['ADOPTION_BATCH_MAX']} decisions per batch"}), 400
+    
+    results = []
+    valid = []
+    for index, decision in enumerate(decisions):
+        result = {'index': index, 'success': False}
+        results.append(result)
+        if not isinstance(decision, dict):
+            result['error'] = 'Decision must be an object'
+            continue
+        result['pet_id'] = decision.get('pet_id')
+        result['application_id'] = decision.get('application_id')
+        missing = [field for field in ('pet_id', 'status', 'application_id') if field not in decision]
+        if missing:
+            result['error'] = f'Missing required field: {missing[0]}'
+        elif decision['status'] not in ('approved', 'rejected'):
+            result['error'] = 'Invalid status. Use "approved" or "rejected"'
+        else:
+            try:
+                # Like the single-decision route, accept 2 or "2" (but not
+                # 2.5, true or [2])
+                pet_id = int(str(decision['pet_id']))
+            except ValueError:
+                result['error'] = 'pet_id must be an integer'
+                continue
+            update = application_decision(pet_id, decision['status'], decision['application_id'],
+                                          decision.get('applicant_email'))
+            if update is None:
+                result['error'] = 'An approval needs the applicant_email or a shelter application_id'
+                continue
+            valid.append((result, dict(decision, pet_id=pet_id), update))
+    
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        
+        pet_ids = list({decision['pet_id'] for _, decision, _ in valid})
+        existing = set()
+        if pet_ids:
+            placeholders = ','.join('?' * len(pet_ids))
+            existing = {row['id'] for row in conn.execute(
+                f'SELECT id FROM pets WHERE id IN ({placeholders})', pet_ids
+            )}
+        
+        adopted = set()
+        logs = []
+        application_updates = []
+        for result, decision, update in valid:
+            pet_id = decision['pet_id']
+            application_id = decision['application_id']
+            applicant_name = decision.get('applicant_name', 'Unknown')
+            pet_name = decision.get('pet_name', 'Unknown Pet')
+            if pet_id not in existing:
+                result['error'] = 'Pet not found'
+                continue
+            
+            result['success'] = True
+            application_updates.append(update)
+            if decision['status'] == 'approved':
+                adopted.add(pet_id)
+                result['message'] = f'Pet {pet_name} marked as adopted successfully'
+                logs.append((pet_id, 1, 'adopted',
+                             f'Pet {pet_name} adopted by {applicant_name} via application {application_id}'))
+            else:
+                result['message'] = f'Adoption application {application_id} rejected'
+                logs.append((pet_id, 1, 'rejection',
+                             f'Adoption application {application_id} for {pet_name} from {applicant_name} rejected'))
+        
+        if adopted:
+            placeholders = ','.join('?' * len(adopted))
+            conn.execute(f'UPDATE pets SET status = "adopted" WHERE id IN ({placeholders})', list(adopted))
+        conn.executemany(DECIDE_APPLICATIONS, application_updates)
+        conn.executemany(
+            'INSERT INTO activity_logs (pet_id, user_id, action, description) VALUES (?, ?, ?, ?)',
+            logs
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error applying adoption decisions: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+    
+    if adopted:
+        notify_pets_changed()
+    
+    succeeded = sum(result['success'] for result in results)
+    print(f"✅ Applied {succeeded} of {len(results)} adoption decisions ({len(adopted)} pets adopted)")
+    
+    return jsonify({
+        'success': succeeded == len(results),
+        'applied': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    })
+
 @app.route('/api/adoption/apply', methods=['POST'])
 def api_adoption_apply():
     """API: Receive adoption application from Django system"""
@@ -330,22 +690,24 @@ def api_adoption_apply():
         pet_name = data.get('pet_name', 'Unknown')
         
         conn = get_db_connection()
+        cursor = conn.execute('''
+            INSERT INTO adoption_applications
+                (pet_id, pet_name, applicant_name, applicant_email, applicant_phone)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (pet_id, pet_name, applicant_name, applicant_email, applicant_phone))
+        conn.commit()
+        application_id = format_application_id(cursor.lastrowid)
         
         # Log the adoption application
-        conn.execute('''
-            INSERT INTO activity_logs (pet_id, user_id, action, description)
-            VALUES (?, 1, 'application', ?)
-        ''', (pet_id, f'Adoption application received for {pet_name} from {applicant_name} ({applicant_email})'))
-        
-        conn.commit()
-        conn.close()
+        activity_log.log(pet_id, 1, 'application',
+                         f'Adoption application received for {pet_name} from {applicant_name} ({applicant_email})')
         
         print(f"📝 Adoption application received - Pet: {pet_id} ({pet_name}), Applicant: {applicant_name}")
         
         return jsonify({
             'success': True,
             'message': 'Adoption application received successfully',
-            'application_id': f"SHELTER-APP-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            'application_id': application_id
         })
         
     except Exception as e:
@@ -354,11 +716,42 @@ def api_adoption_apply():
 
 @app.route('/api/adoption/applications', methods=['GET'])
 def api_adoption_applications():
-    """API: Get all adoption applications (for admin)"""
+    """API: Get adoption applications (for admin), newest first, filtered by ?status= and ?pet_id="""
+    try:
+        limit, after = get_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
-        # This would return applications from your database
-        # For now, return empty array as placeholder
-        return jsonify([])
+        query = 'SELECT * FROM adoption_applications WHERE 1 = 1'
+        params = []
+        if request.args.get('status'):
+            query += ' AND status = ?'
+            params.append(request.args['status'])
+        if request.args.get('pet_id'):
+            query += ' AND pet_id = ?'
+            params.append(request.args.get('pet_id', type=int))
+        if after:
+            # Ids only grow, so they order applications by arrival
+            query += ' AND id < ?'
+            params.append(after[1])
+        query += ' ORDER BY id DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit + 1)
+        
+        rows = get_db_connection().execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        
+        applications = []
+        for row in rows:
+            application = dict(row)
+            application['application_id'] = format_application_id(row['id'])
+            applications.append(application)
+        return paged_response(applications, limit, next_cursor)
         
     except Exception as e:
         print(f"Error fetching adoption applications: {e}")
@@ -378,7 +771,6 @@ def login():
             'SELECT * FROM users WHERE username = ? AND is_active = 1', 
             (username,)
         ).fetchone()
-        conn.close()
         
         if user and check_password(user['password_hash'], password):
             session['user_id'] = user['id']
@@ -467,7 +859,6 @@ def register():
             ))
             
             conn.commit()
-            conn.close()
             
             flash(f'User {full_name} created successfully!', 'success')
             return redirect(url_for('list_users'))
@@ -490,18 +881,19 @@ def index():
     conn = get_db_connection()
     
     # Get basic statistics
+    counts = get_pet_counts(conn)
     stats = {}
-    stats['total_pets'] = conn.execute('SELECT COUNT(*) FROM pets').fetchone()[0]
-    stats['available'] = conn.execute('SELECT COUNT(*) FROM pets WHERE status = "available"').fetchone()[0]
-    stats['pending'] = conn.execute('SELECT COUNT(*) FROM pets WHERE status = "pending"').fetchone()[0]
-    stats['adopted'] = conn.execute('SELECT COUNT(*) FROM pets WHERE status = "adopted"').fetchone()[0]
+    stats['total_pets'] = counts['total']
+    stats['available'] = counts['status'].get('available', 0)
+    stats['pending'] = counts['status'].get('pending', 0)
+    stats['adopted'] = counts['status'].get('adopted', 0)
     
     # Get recent additions
     recent_pets = conn.execute('''
         SELECT p.*, u.full_name as created_by_name 
         FROM pets p 
         LEFT JOIN users u ON p.created_by = u.id 
-        ORDER BY p.created_at DESC 
+        ORDER BY p.created_at DESC, p.id DESC 
         LIMIT 5
     ''').fetchall()
     stats['recent_additions'] = [dict(pet) for pet in recent_pets]
@@ -517,8 +909,6 @@ def index():
     ''').fetchall()
     stats['recent_logs'] = [dict(log) for log in recent_logs]
     
-    conn.close()
-    
     current_user = get_current_user()
     return render_template('index.html', stats=stats, current_user=current_user)
 
@@ -530,38 +920,67 @@ def list_pets():
     status = request.args.get('status', '')
     breed = request.args.get('breed', '')
     
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['PETS_PER_PAGE']
+    
     conn = get_db_connection()
-    query = 'SELECT p.*, u.full_name as created_by_name FROM pets p LEFT JOIN users u ON p.created_by = u.id WHERE 1=1'
+    joins = ''
+    where = ' WHERE 1=1'
     params = []
+    order_by = ' ORDER BY p.created_at DESC, p.id DESC'
     
     if species:
-        query += ' AND p.species = ?'
+        where += ' AND p.species = ?'
         params.append(species)
     if status:
-        query += ' AND p.status = ?'
+        where += ' AND p.status = ?'
         params.append(status)
-    if breed:
-        query += ' AND p.breed LIKE ?'
-        params.append(f'%{breed}%')
+    breed_match = fts_query(breed, 'breed') if breed else None
+    if breed_match:
+        # Full-text prefix match on breed, best matches first
+        joins = ' JOIN pets_fts ON pets_fts.rowid = p.id'
+        where += ' AND pets_fts MATCH ?'
+        params.append(breed_match)
+        order_by = ' ORDER BY pets_fts.rank, p.created_at DESC, p.id DESC'
+    
+    # Status counts for the whole filtered set (not just the current page)
+    counts = {'total': 0, 'available': 0, 'pending': 0, 'adopted': 0}
+    for row in conn.execute(
+        'SELECT p.status, COUNT(*) as total FROM pets p' + joins + where + ' GROUP BY p.status', params
+    ):
+        counts['total'] += row['total']
+        if row['status'] in counts:
+            counts[row['status']] = row['total']
+    
+    pages = max((counts['total'] + per_page - 1) // per_page, 1)
+    page = min(page, pages)
     
-    query += ' ORDER BY p.created_at DESC'
-    pets = conn.execute(query, params).fetchall()
+    query = ('SELECT p.*, u.full_name as created_by_name FROM pets p' + joins +
+             ' LEFT JOIN users u ON p.created_by = u.id' + where + order_by +
+             ' LIMIT ? OFFSET ?')
+    pets = conn.execute(query, params + [per_page, (page - 1) * per_page]).fetchall()
     
-    # Get images for each pet
-    pets_with_images = []
-    for pet in pets:
-        pet_dict = dict(pet)
+    # Get images for every pet on this page in one query
+    pets_with_images = [dict(pet) for pet in pets]
+    images_by_pet = {pet['id']: [] for pet in pets_with_images}
+    if images_by_pet:
+        placeholders = ','.join('?' * len(images_by_pet))
         images = conn.execute(
-            'SELECT * FROM pet_images WHERE pet_id = ?', 
-            (pet_dict['id'],)
+            f'SELECT * FROM pet_images WHERE pet_id IN ({placeholders}) ORDER BY id',
+            list(images_by_pet)
         ).fetchall()
-        pet_dict['images'] = [dict(img) for img in images]
-        pets_with_images.append(pet_dict)
+        for img in images:
+            images_by_pet[img['pet_id']].append(dict(img))
+    for pet_dict in pets_with_images:
+        pet_dict['images'] = images_by_pet[pet_dict['id']]
     
-    conn.close()
+    pagination = {'page': page, 'pages': pages, 'per_page': per_page, 'total': counts['total']}
+    filters = {key: value for key, value in
+               (('species', species), ('status', status), ('breed', breed)) if value}
     
     current_user = get_current_user()
-    return render_template('list_pets.html', pets=pets_with_images, current_user=current_user)
+    return render_template('list_pets.html', pets=pets_with_images, counts=counts,
+                           pagination=pagination, filters=filters, current_user=current_user)
 
 @app.route('/pets/add', methods=['GET', 'POST'])
 @login_required
@@ -613,14 +1032,11 @@ def add_pet():
                     request.form.get('image_caption', '')
                 ))
             
-            # Log the activity
-            conn.execute('''
-                INSERT INTO activity_logs (pet_id, user_id, action, description)
-                VALUES (?, ?, 'added', 'Added new pet to system')
-            ''', (pet_id, session['user_id']))
-            
             conn.commit()
-            conn.close()
+            notify_pets_changed()
+            
+            # Log the activity
+            activity_log.log(pet_id, session['user_id'], 'added', 'Added new pet to system')
             
             flash(f'Pet {request.form["name"]} added successfully!', 'success')
             return redirect(url_for('view_pet', pet_id=pet_id))
@@ -660,8 +1076,6 @@ def view_pet(pet_id):
         ORDER BY al.timestamp DESC
     ''', (pet_id,)).fetchall()
     
-    conn.close()
-    
     current_user = get_current_user()
     return render_template('view_pet.html', 
                          pet=dict(pet), 
@@ -705,14 +1119,11 @@ def edit_pet(pet_id):
                 pet_id
             ))
             
-            # Log the activity
-            conn.execute('''
-                INSERT INTO activity_logs (pet_id, user_id, action, description)
-                VALUES (?, ?, 'updated', 'Updated pet information')
-            ''', (pet_id, session['user_id']))
-            
             conn.commit()
-            conn.close()
+            notify_pets_changed()
+            
+            # Log the activity
+            activity_log.log(pet_id, session['user_id'], 'updated', 'Updated pet information')
             
             flash(f'Pet {request.form["name"]} updated successfully!', 'success')
             return redirect(url_for('view_pet', pet_id=pet_id))
@@ -721,7 +1132,6 @@ def edit_pet(pet_id):
             flash(f'Error updating pet: {str(e)}', 'danger')
     
     pet = conn.execute('SELECT * FROM pets WHERE id = ?', (pet_id,)).fetchone()
-    conn.close()
     
     if not pet:
         flash('Pet not found!', 'danger')
@@ -744,13 +1154,15 @@ def delete_pet(pet_id):
             flash('Pet not found!', 'danger')
             return redirect(url_for('list_pets'))
         
-        # Delete related records first
+        # Delete related records first, after writing out any queued log
+        # entries so none of them lands after the pet is gone
+        activity_log.flush()
         conn.execute('DELETE FROM activity_logs WHERE pet_id = ?', (pet_id,))
         conn.execute('DELETE FROM pet_images WHERE pet_id = ?', (pet_id,))
         conn.execute('DELETE FROM pets WHERE id = ?', (pet_id,))
         
         conn.commit()
-        conn.close()
+        notify_pets_changed()
         
         flash(f'Pet {pet["name"]} deleted successfully!', 'success')
     except Exception as e:
@@ -760,25 +1172,46 @@ def delete_pet(pet_id):
 
 # Original API Endpoints (for internal use)
 @app.route('/api/pets/', methods=['GET'])
+@conditional_on_data_version
 def api_get_pets():
     """API: Get all pets (public for adoption system integration)"""
-    conn = get_db_connection()
-    pets = conn.execute('SELECT * FROM pets WHERE status = "available"').fetchall()
-    conn.close()
-    return jsonify([dict(pet) for pet in pets])
+    try:
+        limit, after = get_page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    snapshot = get_catalog()
+    return catalog_page_response(snapshot, snapshot.rows, limit, after)
 
 @app.route('/api/pets/<int:pet_id>', methods=['GET'])
 def api_get_pet(pet_id):
     """API: Get specific pet (public for adoption system integration)"""
     conn = get_db_connection()
     pet = conn.execute('SELECT * FROM pets WHERE id = ?', (pet_id,)).fetchone()
-    conn.close()
     
     if pet:
         return jsonify(dict(pet))
     else:
         return jsonify({'error': 'Pet not found'}), 404
 
+# Request content types accepted by the bulk import
+IMPORT_FORMATS = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson'}
+
+@app.route('/api/pets/import', methods=['POST'])
+@login_required
+def api_import_pets():
+    """API: Bulk import pets from a CSV or NDJSON request body (protected)"""
+    fmt = request.args.get('format') or IMPORT_FORMATS.get(request.mimetype)
+    if fmt not in IMPORT_FORMATS.values():
+        return jsonify({'error': 'Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson'}), 415
+    
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    result = import_pets(get_db_connection(), read_rows(stream, fmt), session['user_id'])
+    if result['imported']:
+        notify_pets_changed()
+    
+    return jsonify(result)
+
 @app.route('/api/update-status/', methods=['PUT'])
 @login_required
 def api_update_status():
@@ -790,14 +1223,11 @@ def api_update_status():
     conn = get_db_connection()
     conn.execute('UPDATE pets SET status = ? WHERE id = ?', (new_status, pet_id))
     
-    # Log the activity
-    conn.execute('''
-        INSERT INTO activity_logs (pet_id, user_id, action, description)
-        VALUES (?, ?, 'status_update', ?)
-    ''', (pet_id, session['user_id'], f'Status changed to {new_status}'))
-    
     conn.commit()
-    conn.close()
+    notify_pets_changed()
+    
+    # Log the activity
+    activity_log.log(pet_id, session['user_id'], 'status_update', f'Status changed to {new_status}')
     
     return jsonify({'success': True})
 
@@ -807,15 +1237,26 @@ def api_stats():
     """API: Get shelter statistics (protected)"""
     conn = get_db_connection()
     
+    counts = get_pet_counts(conn)
     stats = {}
-    stats['total_pets'] = conn.execute('SELECT COUNT(*) FROM pets').fetchone()[0]
-    stats['available_pets'] = conn.execute('SELECT COUNT(*) FROM pets WHERE status = "available"').fetchone()[0]
-    stats['dogs'] = conn.execute('SELECT COUNT(*) FROM pets WHERE species = "dog"').fetchone()[0]
-    stats['cats'] = conn.execute('SELECT COUNT(*) FROM pets WHERE species = "cat"').fetchone()[0]
+    stats['total_pets'] = counts['total']
+    stats['available_pets'] = counts['status'].get('available', 0)
+    stats['dogs'] = counts['species'].get('dog', 0)
+    stats['cats'] = counts['species'].get('cat', 0)
     
-    conn.close()
     return jsonify(stats)
 
+@app.route('/api/diagnostics')
+@login_required
+def api_diagnostics():
+    """API: Internal queue and cache statistics (protected)"""
+    return jsonify({
+        'activity_log': activity_log.stats(),
+        'chatbot_cache': chatbot.cache.stats(),
+        'pet_detail_cache': pet_detail_cache.stats(),
+        'catalog': catalog.stats()
+    })
+
 # Chatbot Routes
 @app.route('/chatbot')
 @login_required
@@ -834,6 +1275,50 @@ def chatbot_api():
     response = chatbot.process_message(user_message)
     return jsonify({'response': response})
 
+@app.route('/chatbot/api/chat/batch', methods=['POST'])
+@login_required
+def chatbot_batch_api():
+    """Chatbot API: answer several messages against one database snapshot"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Send a JSON object with a messages list'}), 400
+    messages = data.get('messages')
+    
+    if not isinstance(messages, list):
+        return jsonify({'error': 'messages must be a list'}), 400
+    if len(messages) > app.config['CHATBOT_MAX_BATCH']:
+        return jsonify({'error': f"At most {app.config['CHATBOT_MAX_BATCH']} messages per batch"}), 400
+    
+    # A single read transaction, so every answer sees the same data
+    conn = get_db_connection()
+    conn.execute('BEGIN')
+    try:
+        responses = [chatbot.process_message(str(message)) for message in messages]
+    finally:
+        conn.rollback()
+    
+    return jsonify({'responses': responses})
+
+@app.route('/chatbot/api/chat/stream', methods=['GET'])
+@login_required
+def chatbot_stream_api():
+    """Chatbot API: stream the response as Server-Sent Events, one line per event"""
+    user_message = request.args.get('message', '')
+    
+    def generate():
+        pending = ''
+        for chunk in chatbot.stream_message(user_message):
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield f'data: {line}\n\n'
+        if pending:
+            yield f'data: {pending}\n\n'
+        yield 'event: done\ndata: \n\n'
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # User Management (Admin only)
 @app.route('/users')
 @login_required
@@ -845,7 +1330,6 @@ def list_users():
     
     conn = get_db_connection()
     users = conn.execute('SELECT * FROM users ORDER BY created_at DESC').fetchall()
-    conn.close()
     
     current_user = get_current_user()
     return render_template('users.html', users=[dict(user) for user in users], current_user=current_user)
@@ -883,7 +1367,8 @@ def delete_user(user_id):
         conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
         
         conn.commit()
-        conn.close()
+        # Pets created by the user lose their shelter name and email
+        notify_pets_changed()
         
         flash(f'User {user["full_name"]} ({user["username"]}) deleted successfully!', 'success')
         
@@ -920,7 +1405,6 @@ def toggle_user_status(user_id):
         conn.execute('UPDATE users SET is_active = ? WHERE id = ?', (new_status, user_id))
         
         conn.commit()
-        conn.close()
         
         status_text = 'activated' if new_status else 'deactivated'
         flash(f'User account {status_text} successfully!', 'success')
@@ -996,7 +1480,8 @@ def edit_user(user_id):
             ''', (full_name, username, email, role, is_active, user_id))
         
         conn.commit()
-        conn.close()
+        # The shelter name and email are part of the pet payloads
+        notify_pets_changed()
         
         flash(f'User {full_name} updated successfully!', 'success')
         
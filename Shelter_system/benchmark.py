@@ -0,0 +1,277 @@
+"""
+Benchmarks for the shelter system API
+
+Usage: python benchmark.py [adoption-pets] [http --concurrency 8 --output report.json]
+"""
+import os
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import app as shelter_app
+import populate
+from models import connect_db
+
+
+def seed_pets(conn, count, seed=42):
+    """Insert `count` available pets, giving most of them one or two images"""
+    rng = random.Random(seed)
+    species = ['dog', 'cat']
+
+    conn.executemany('''
+        INSERT INTO pets (name, species, breed, age, gender, status, description, created_by)
+        VALUES (?, ?, ?, ?, ?, 'available', ?, 1)
+    ''', [
+        (f'Pet {i}', rng.choice(species), 'Mixed', rng.randint(0, 15),
+         rng.choice(['male', 'female']), 'Benchmark pet')
+        for i in range(count)
+    ])
+
+    pet_ids = [row[0] for row in conn.execute('SELECT id FROM pets')]
+    images = []
+    for pet_id in pet_ids:
+        roll = rng.random()
+        if roll < 0.5:
+            images.append((pet_id, f'https://example.com/{pet_id}/primary.jpg', 1))
+        elif roll < 0.8:
+            # Only non-primary images: exercises the "first image" fallback
+            images.append((pet_id, f'https://example.com/{pet_id}/a.jpg', 0))
+            images.append((pet_id, f'https://example.com/{pet_id}/b.jpg', 0))
+    conn.executemany(
+        'INSERT INTO pet_images (pet_id, image_url, is_primary) VALUES (?, ?, ?)',
+        images
+    )
+    conn.commit()
+
+
+class QueryCounter:
+    """Counts the SQL statements issued through the app's connections"""
+
+    def __init__(self):
+        self.count = 0
+        self._get_db_connection = shelter_app.get_db_connection
+
+    def _trace(self, statement):
+        self.count += 1
+
+    def get_db_connection(self):
+        conn = self._get_db_connection()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def __enter__(self):
+        self.count = 0
+        shelter_app.get_db_connection = self.get_db_connection
+        return self
+
+    def __exit__(self, *exc_info):
+        shelter_app.get_db_connection = self._get_db_connection
+
+
+def prepare_database(workdir):
+    """Point the app at a fresh database inside `workdir`"""
+    os.chdir(workdir)
+    shelter_app.app.config['DATABASE'] = os.path.join(workdir, 'instance', 'shelter.db')
+    shelter_app.init_db()
+
+
+def bench_adoption_pets(sizes=(100, 10000)):
+    """Check that /api/adoption/pets issues the same number of queries at any catalog size"""
+    print("\n=== /api/adoption/pets query count ===")
+    client = shelter_app.app.test_client()
+    counts = {}
+    cwd = os.getcwd()
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            prepare_database(workdir)
+            conn = connect_db(shelter_app.app.config['DATABASE'])
+            seed_pets(conn, size)
+            conn.close()
+
+            with QueryCounter() as counter:
+                started = time.perf_counter()
+                response = client.get('/api/adoption/pets')
+                elapsed = time.perf_counter() - started
+
+            assert response.status_code == 200, response.status_code
+            assert len(response.get_json()) == size
+            counts[size] = counter.count
+            print(f"  {size:>6} pets: {counter.count} queries, {elapsed * 1000:.1f} ms")
+            os.chdir(cwd)
+
+    assert len(set(counts.values())) == 1, f"Query count grows with catalog size: {counts}"
+    print("✓ Query count is constant")
+    return counts
+
+
+CHATBOT_MESSAGES = [
+    'How many pets do you have?', 'show available pets', 'Find Max', 'search for buddy',
+    'any dogs?', 'how many dogs', 'cats good with kids', 'pets for a family with children',
+    'recent activity', 'help', 'what can you do', 'hello there',
+    'I would like to know which of your lovely animals are available for adoption this week',
+]
+
+
+HTTP_SCENARIOS = {
+    'adoption-pets': ('GET', '/api/adoption/pets'),
+    'adoption-pet-detail': ('GET', '/api/adoption/pets/{pet_id}'),
+    'pets-page': ('GET', '/pets'),
+    'dashboard': ('GET', '/'),
+    'chatbot': ('POST', '/chatbot/api/chat'),
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def logged_in_client():
+    client = shelter_app.app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, username='admin', full_name='System Administrator', role='admin')
+    return client
+
+
+def query_totals(endpoint):
+    """(statements, requests) recorded so far by the app's metrics for an endpoint"""
+    histogram = shelter_app.metrics.queries.get((endpoint, 'GET')) \
+        or shelter_app.metrics.queries.get((endpoint, 'POST'))
+    return (histogram.sum, histogram.count) if histogram else (0, 0)
+
+
+def run_scenario(name, requests, concurrency, pet_ids, seed):
+    """Send `requests` requests for one scenario from `concurrency` threads"""
+    method, path = HTTP_SCENARIOS[name]
+    rng = random.Random(seed)
+    # Drawn up front, so every run sends the same requests in the same order
+    jobs = [(path.format(pet_id=rng.choice(pet_ids)), {'message': rng.choice(CHATBOT_MESSAGES)})
+            for _ in range(requests)]
+    local = threading.local()
+
+    def send(job):
+        url, payload = job
+        if not hasattr(local, 'client'):
+            local.client = logged_in_client()
+        started = time.perf_counter()
+        response = local.client.open(url, method=method, json=payload if method == 'POST' else None)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        response.close()
+        return elapsed, response.status_code
+
+    endpoint = shelter_app.app.url_map.bind('localhost').match(jobs[0][0], method=method)[0]
+    queries_before = query_totals(endpoint)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, jobs))
+    wall = time.perf_counter() - started
+    queries_after = query_totals(endpoint)
+
+    latencies = sorted(elapsed for elapsed, _ in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    statements = queries_after[0] - queries_before[0]
+    counted = queries_after[1] - queries_before[1]
+    return {
+        'method': method,
+        'path': path,
+        'requests': requests,
+        'concurrency': concurrency,
+        'statuses': statuses,
+        'throughput_rps': round(requests / wall, 1),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'queries_per_request': round(statements / counted, 2) if counted else None,
+    }
+
+
+def bench_http(args):
+    """Latency, throughput and SQL statements per request for the main pages and APIs
+
+    The app is driven in-process through the Flask test client from a pool
+    of threads, against a database generated by populate.py with a fixed
+    seed, so nothing depends on the network and runs are comparable. Each
+    scenario is warmed up first; the JSON report goes to --output or stdout.
+    """
+    print("\n=== HTTP load ===")
+    scenarios = args.scenarios or list(HTTP_SCENARIOS)
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'dataset': {'seed': args.seed, 'users': args.users, 'pets': args.pets},
+        'scenarios': {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare_database(workdir)
+        conn = connect_db(shelter_app.app.config['DATABASE'])
+        report['dataset']['rows'] = populate.generate_dataset(conn, args.users, args.pets, seed=args.seed)
+        pet_ids = [row[0] for row in conn.execute('SELECT id FROM pets WHERE status = "available"')]
+        conn.close()
+
+        for name in scenarios:
+            run_scenario(name, args.warmup, args.concurrency, pet_ids, args.seed)
+            result = run_scenario(name, args.requests, args.concurrency, pet_ids, args.seed)
+            report['scenarios'][name] = result
+            latency = result['latency_ms']
+            print(f"  {name:>20}: {result['throughput_rps']:>8,.1f} req/s  p50 {latency['p50']:.1f} ms"
+                  f"  p95 {latency['p95']:.1f} ms  p99 {latency['p99']:.1f} ms"
+                  f"  {result['queries_per_request']} queries/request")
+        os.chdir(cwd)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {output}")
+    else:
+        print(json.dumps(report, indent=2))
+    return report
+
+
+BENCHMARKS = {
+    'adoption-pets': lambda args: bench_adoption_pets(sizes=(100, args.pets)),
+    'http': bench_http,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    parser.add_argument('--pets', type=int, default=10000, help='Largest catalog size to seed')
+    parser.add_argument('--users', type=int, default=100, help='Users to generate for the http benchmark')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the generated data and requests')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per http scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients per http scenario')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests before each scenario')
+    parser.add_argument('--scenario', dest='scenarios', action='append', choices=list(HTTP_SCENARIOS),
+                        help='Limit the http benchmark to these scenarios (repeatable)')
+    parser.add_argument('--output', help='Write the http benchmark JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    for name in args.benchmarks or BENCHMARKS:
+        if name not in BENCHMARKS:
+            parser.error(f"Unknown benchmark: {name}")
+        BENCHMARKS[name](args)
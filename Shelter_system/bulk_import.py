@@ -0,0 +1,219 @@
+"""
+Bulk pet intake from CSV or NDJSON
+
+Rows are read and validated one at a time, so a file of any size is imported
+in constant memory. Valid rows are inserted CHUNK_SIZE at a time: pets,
+primary images and 'added' activity log entries each with one executemany,
+in one transaction per chunk. Invalid rows are reported with their line
+number and skipped; they never abort the rest of the import.
+
+Usage: python bulk_import.py intake.csv [--format ndjson] [--db path] [--user-id 1]
+"""
+import argparse
+import csv
+import io
+import json
+import sqlite3
+import sys
+
+from models import connect_db
+
+CHUNK_SIZE = 500
+
+SPECIES = {'dog', 'cat'}
+GENDERS = {'male', 'female'}
+STATUSES = {'available', 'pending', 'adopted'}
+ENERGY_LEVELS = {'', 'low', 'medium', 'high'}
+
+# Boolean columns and their default when a row leaves them out (as in the schema)
+BOOL_DEFAULTS = {
+    'vaccinated': 0, 'spayed_neutered': 0, 'microchipped': 0,
+    'good_with_kids': 1, 'good_with_pets': 1, 'good_with_dogs': 1, 'good_with_cats': 1,
+}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', ''}
+
+PET_COLUMNS = [
+    'name', 'species', 'breed', 'age', 'gender', 'status', 'description',
+    'vaccinated', 'spayed_neutered', 'microchipped', 'special_needs',
+    'good_with_kids', 'good_with_pets', 'good_with_dogs', 'good_with_cats',
+    'energy_level', 'image_url', 'created_by'
+]
+
+def insert_pets(conn, rows, columns=PET_COLUMNS):
+    """Insert pet rows with one executemany and return their ids, in order
+
+    Call it inside BEGIN IMMEDIATE: with the write lock held, and pets using
+    AUTOINCREMENT, the rows got consecutive ids ending at the last inserted rowid.
+    """
+    conn.executemany(f'''
+        INSERT INTO pets ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+    ''', rows)
+    last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return range(last_id - len(rows) + 1, last_id + 1)
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or None, parse error or None) from a text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+def _text(row, field):
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+def _choice(row, field, choices, default=None):
+    value = _text(row, field).lower() or default
+    if value not in choices:
+        raise ValueError(f"{field} must be one of: {', '.join(sorted(c for c in choices if c))}")
+    return value
+
+def _flag(row, field):
+    value = row.get(field)
+    if value is None:
+        return BOOL_DEFAULTS[field]
+    if isinstance(value, bool):
+        return int(value)
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return 1
+    if value in FALSE_VALUES:
+        return 0
+    raise ValueError(f'{field} must be true or false')
+
+def validate_row(row, user_id):
+    """Return the pets insert parameters for a row, raising ValueError if it is invalid"""
+    name = _text(row, 'name')
+    if not name:
+        raise ValueError('name is required')
+    try:
+        age = int(_text(row, 'age'))
+    except ValueError:
+        raise ValueError('age must be a whole number') from None
+    if not 0 <= age <= 30:
+        raise ValueError('age must be between 0 and 30')
+
+    values = {
+        'name': name,
+        'species': _choice(row, 'species', SPECIES),
+        'breed': _text(row, 'breed'),
+        'age': age,
+        'gender': _choice(row, 'gender', GENDERS),
+        'status': _choice(row, 'status', STATUSES, default='available'),
+        'description': _text(row, 'description'),
+        'special_needs': _text(row, 'special_needs'),
+        'energy_level': _choice(row, 'energy_level', ENERGY_LEVELS, default=''),
+        'image_url': _text(row, 'image_url'),
+        'created_by': user_id,
+    }
+    for field in BOOL_DEFAULTS:
+        values[field] = _flag(row, field)
+    return tuple(values[column] for column in PET_COLUMNS), _text(row, 'image_caption')
+
+def _insert_chunk(conn, chunk, user_id):
+    """Insert validated rows in one transaction and return their new pet ids"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        pet_ids = insert_pets(conn, [params for params, _ in chunk])
+
+        image_url = PET_COLUMNS.index('image_url')
+        conn.executemany(
+            'INSERT INTO pet_images (pet_id, image_url, caption, is_primary) VALUES (?, ?, ?, 1)',
+            [(pet_id, params[image_url], caption)
+             for pet_id, (params, caption) in zip(pet_ids, chunk) if params[image_url]]
+        )
+        conn.executemany(
+            'INSERT INTO activity_logs (pet_id, user_id, action, description) VALUES (?, ?, ?, ?)',
+            [(pet_id, user_id, 'added', 'Added new pet to system (bulk import)') for pet_id in pet_ids]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return list(pet_ids)
+
+def import_pets(conn, rows, user_id, chunk_size=CHUNK_SIZE):
+    """Validate and insert rows from read_rows()
+
+    Returns {'imported': n, 'failed': n, 'pet_ids': [...], 'errors': [{'line', 'error'}]}.
+    If a chunk is rejected by the database its rows are retried one by one,
+    so only the offending rows are reported.
+    """
+    result = {'imported': 0, 'failed': 0, 'pet_ids': [], 'errors': []}
+
+    def fail(line_number, error):
+        result['failed'] += 1
+        result['errors'].append({'line': line_number, 'error': error})
+
+    def flush(chunk):
+        try:
+            pet_ids = _insert_chunk(conn, [values for _, values in chunk], user_id)
+        except sqlite3.Error:
+            if len(chunk) == 1:
+                raise
+            for item in chunk:
+                try:
+                    flush([item])
+                except sqlite3.Error as e:
+                    fail(item[0], f'Database error: {e}')
+            return
+        result['imported'] += len(pet_ids)
+        result['pet_ids'].extend(pet_ids)
+
+    chunk = []
+    for line_number, row, error in rows:
+        if error is None:
+            try:
+                chunk.append((line_number, validate_row(row, user_id)))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            fail(line_number, error)
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+    return result
+
+def import_file(conn, path, fmt=None, user_id=1, chunk_size=CHUNK_SIZE):
+    """Import a CSV or NDJSON file, guessing the format from its extension"""
+    if fmt is None:
+        fmt = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+    with io.open(path, newline='', encoding='utf-8-sig') as stream:
+        return import_pets(conn, read_rows(stream, fmt), user_id, chunk_size)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import pets from a CSV or NDJSON file')
+    parser.add_argument('path', help='CSV or NDJSON file with one pet per row')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='Default: from the file extension')
+    parser.add_argument('--db', default='instance/shelter.db', help='Shelter database path')
+    parser.add_argument('--user-id', type=int, default=1, help='User recorded as creating the pets')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per transaction')
+    args = parser.parse_args()
+
+    conn = connect_db(args.db)
+    result = import_file(conn, args.path, args.format, args.user_id, args.chunk_size)
+    conn.close()
+
+    for error in result['errors']:
+        print(f"❌ Line {error['line']}: {error['error']}")
+    print(f"✅ Imported {result['imported']} pets, {result['failed']} rows failed")
+    sys.exit(1 if result['failed'] else 0)
@@ -0,0 +1,67 @@
+"""
+Small in-process caches for shelter responses
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """Bounded, thread-safe LRU with a per-entry TTL
+
+    Writers call invalidate() after committing: for one key, or for every
+    key. Each invalidation bumps `generation`; a value computed before it
+    (set() is given the generation read before computing) is not stored,
+    so a slow reader cannot put back data a write has just replaced.
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, generation):
+        """Store a value computed at `generation`, unless an invalidation happened meanwhile"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when none is given"""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'generation': self.generation,
+                'hits': self.hits,
+                'misses': self.misses
+            }
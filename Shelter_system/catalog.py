@@ -0,0 +1,242 @@
+"""
+In-memory snapshot of the available pet catalog
+
+The available catalog is read far more often than it is written, so it is
+loaded once into an immutable snapshot, already in its JSON-ready shape, and
+only reloaded when the trigger-maintained data version moves on. Reads then
+cost a single data_version lookup instead of a query over pets and images.
+"""
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime
+
+from models import get_data_version
+
+# Pets with shelter information and their primary image (falling back to the
+# first uploaded image). The subquery is an index lookup on
+# pet_images(pet_id, is_primary), so the whole result is a single statement.
+PETS_WITH_IMAGE_QUERY = '''
+    SELECT p.*, u.full_name as shelter_name, u.email as shelter_email,
+           (SELECT pi.image_url FROM pet_images pi
+            WHERE pi.pet_id = p.id
+            ORDER BY pi.is_primary DESC, pi.id
+            LIMIT 1) as primary_image
+    FROM pets p
+    LEFT JOIN users u ON p.created_by = u.id
+'''
+AVAILABLE_PETS_QUERY = (PETS_WITH_IMAGE_QUERY + ' WHERE p.status = "available"'
+                        ' ORDER BY p.created_at DESC, p.id DESC')
+
+# Columns added by PETS_WITH_IMAGE_QUERY on top of the pets table
+JOINED_FIELDS = ('shelter_name', 'shelter_email', 'primary_image')
+
+# SQLite stores these as 0/1; the APIs return them as JSON booleans
+BOOL_FIELDS = ['vaccinated', 'spayed_neutered', 'microchipped',
+               'good_with_kids', 'good_with_pets', 'good_with_dogs', 'good_with_cats']
+
+# pets.traits packs BOOL_FIELDS into one integer, field i in bit i
+TRAIT_BITS = {field: 1 << bit for bit, field in enumerate(BOOL_FIELDS)}
+# The decoded booleans for every possible mask, so a row costs one lookup
+TRAIT_FLAGS = tuple({field: bool(mask & bit) for field, bit in TRAIT_BITS.items()}
+                    for mask in range(1 << len(BOOL_FIELDS)))
+
+def traits_mask(fields):
+    """Return the pets.traits mask for trait names, raising ValueError on unknown ones"""
+    unknown = [field for field in fields if field not in TRAIT_BITS]
+    if unknown:
+        raise ValueError(f"Unknown traits: {', '.join(unknown)}. Valid traits: {', '.join(BOOL_FIELDS)}")
+    mask = 0
+    for field in fields:
+        mask |= TRAIT_BITS[field]
+    return mask
+
+# Age bucket names and their inclusive upper bound in years (None: no bound)
+AGE_BUCKETS = (('young', 2), ('adult', 7), ('senior', None))
+
+def age_bucket(age):
+    """Name of the AGE_BUCKETS entry an age falls into"""
+    for name, upper in AGE_BUCKETS:
+        if upper is None or (age or 0) <= upper:
+            return name
+
+def serialize_pet(pet):
+    """Convert a pet row to a dict with the boolean fields as Python booleans"""
+    pet_dict = dict(pet)
+    traits = pet_dict.get('traits')
+    if traits is not None:
+        pet_dict.update(TRAIT_FLAGS[traits])
+        return pet_dict
+    # Rows that do not select the traits column
+    for field in BOOL_FIELDS:
+        pet_dict[field] = bool(pet_dict[field]) if field in pet_dict else False
+    return pet_dict
+
+def deep_sizeof(obj, seen=None):
+    """Approximate memory held by obj and the containers and values inside it"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+class CatalogSnapshot:
+    """The available pets at one data version
+
+    Never modified once built: `pets` holds the adoption API shape (with the
+    shelter, primary image and boolean fields), `rows` the plain pets columns,
+    both newest first. Callers must not mutate the dicts they get back.
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.pets = tuple(serialize_pet(row) for row in rows)
+        self.rows = tuple({key: row[key] for key in row.keys() if key not in JOINED_FIELDS}
+                          for row in rows)
+        # Ascending (created_at, id) keys for bisecting keyset cursors
+        self._keys = [((pet['created_at'] or ''), pet['id']) for pet in reversed(self.rows)]
+        by_species = {}
+        for pet in sorted(self.rows, key=lambda pet: pet['name']):
+            by_species.setdefault(pet['species'], []).append(pet)
+        self._species = {species: tuple(pets) for species, pets in by_species.items()}
+        self.good_with_kids = tuple(sorted(
+            (pet for pet in self.rows if pet['good_with_kids']),
+            key=lambda pet: (pet['species'], pet['name'])
+        ))
+        self.built_at = datetime.now()
+        self._size_bytes = None
+
+    def __len__(self):
+        return len(self.pets)
+
+    @property
+    def size_bytes(self):
+        """Approximate memory held by the snapshot, measured on first use"""
+        if self._size_bytes is None:
+            self._size_bytes = deep_sizeof((self.pets, self.rows, self._keys,
+                                            self._species, self.good_with_kids))
+        return self._size_bytes
+
+    def by_species(self, species):
+        """Available pets of one species, by name"""
+        return self._species.get(species, ())
+
+    def facets(self, equals=None, breed=None, bucket=None, traits=0):
+        """Count matching pets per species, gender, energy level, age bucket and trait
+
+        `equals` maps fields to required values, `breed` is a case-insensitive
+        substring, `bucket` an AGE_BUCKETS name and `traits` a mask of traits
+        the pet must all have. Ages and trait masks are tallied as raw values
+        and only folded into buckets and per-trait counts at the end.
+        """
+        equals = list((equals or {}).items())
+        breed = breed.lower() if breed else None
+        species, genders, energy_levels, ages, masks = (Counter() for _ in range(5))
+        for pet in self.pets:
+            if equals and any(pet[field] != value for field, value in equals):
+                continue
+            if breed and breed not in (pet['breed'] or '').lower():
+                continue
+            if traits and (pet['traits'] & traits) != traits:
+                continue
+            if bucket and age_bucket(pet['age']) != bucket:
+                continue
+            species[pet['species']] += 1
+            genders[pet['gender'] or 'unspecified'] += 1
+            energy_levels[pet['energy_level'] or 'unspecified'] += 1
+            ages[pet['age']] += 1
+            masks[pet['traits']] += 1
+
+        buckets = dict.fromkeys((name for name, _ in AGE_BUCKETS), 0)
+        for age, count in ages.items():
+            buckets[age_bucket(age)] += count
+        return {
+            'total': sum(species.values()),
+            'species': dict(species),
+            'gender': dict(genders),
+            'energy_level': dict(energy_levels),
+            'age_bucket': buckets,
+            'traits': {field: sum(count for mask, count in masks.items() if mask & bit)
+                       for field, bit in TRAIT_BITS.items()}
+        }
+
+    def page(self, items, limit=None, after=None):
+        """Slice `items` (pets or rows) as one keyset page, newest first
+
+        Returns the items and the (created_at, id) of the last one when
+        another page follows, else None.
+        """
+        start = 0
+        if after:
+            # Keys below the cursor are the tail of the newest-first order
+            start = len(self._keys) - bisect_left(self._keys, (after[0] or '', after[1]))
+        if limit is None:
+            return items[start:], None
+        page = items[start:start + limit]
+        if start + limit >= len(items):
+            return page, None
+        return page, (page[-1]['created_at'], page[-1]['id'])
+
+class AvailableCatalog:
+    """Holds the current CatalogSnapshot and swaps in a new one when the data changes"""
+
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.last_build_ms = 0.0
+
+    def get(self, conn, version=None):
+        """Return the snapshot for the database's current data version
+
+        Pass `version` when it has already been read on this connection (the
+        HTTP validators do) to skip the lookup. At most one thread rebuilds;
+        the others wait and then share its snapshot.
+        """
+        if version is None:
+            version = get_data_version(conn)[0]
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._build(conn)
+                self._snapshot = snapshot
+            return snapshot
+
+    def _build(self, conn):
+        started = time.perf_counter()
+        # Read the version and the rows in one transaction so they match,
+        # unless the caller already holds one
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute('BEGIN')
+        try:
+            version = get_data_version(conn)[0]
+            snapshot = CatalogSnapshot(version, conn.execute(AVAILABLE_PETS_QUERY).fetchall())
+        finally:
+            if own_transaction:
+                conn.rollback()
+        self.rebuilds += 1
+        self.last_build_ms = (time.perf_counter() - started) * 1000
+        return snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'pets': len(snapshot) if snapshot else 0,
+            'size_bytes': snapshot.size_bytes if snapshot else 0,
+            'built_at': snapshot.built_at.isoformat() if snapshot else None,
+            'rebuilds': self.rebuilds,
+            'last_build_ms': round(self.last_build_ms, 2)
+        }
@@ -1,61 +1,125 @@
-import sqlite3
 import re
 from datetime import datetime
+from models import Database, get_pet_counts, get_data_version, fts_query
+from catalog import AvailableCatalog
+from cache import LRUCache
+
+# Intents whose answers only change when pets change. Activity is left out:
+# log entries are written without touching the pets table.
+CACHED_INTENTS = {'search', 'species', 'kids', 'available', 'stats'}
 
 class ShelterChatbot:
-    def __init__(self, db_path='instance/shelter.db'):
+    SEARCH_LIMIT = 10
+    
+    def __init__(self, db_path='instance/shelter.db', connection_factory=None,
+                 catalog=None, cache_size=256, cache_ttl=60):
         self.db_path = db_path
+        self.db = Database(db_path)
+        # The Flask app passes its per-request connection getter so the
+        # chatbot shares the request's connection instead of opening another
+        self.connection_factory = connection_factory or self.db.get_connection
+        # The list intents read the shared in-memory available catalog
+        self.catalog = catalog or AvailableCatalog()
+        self.cache = LRUCache(maxsize=cache_size, ttl=cache_ttl)
     
     def get_db_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return self.connection_factory()
     
-    def process_message(self, message):
-        message = message.lower().strip()
-        
+    def route(self, message):
+        """Return (intent, entities) for a normalized message, or (None, {})"""
         # Statistics queries
         if any(word in message for word in ['how many', 'statistics', 'stats', 'total']):
-            return self.get_pet_statistics()
+            return 'stats', {}
         
         # Available pets
         elif any(word in message for word in ['available', 'show pets', 'list pets']):
-            return self.get_available_pets()
+            return 'available', {}
         
         # Search by name
         elif 'find' in message or 'search' in message:
-            return self.search_pet_by_name(message)
+            name_match = re.search(r'find\s+(\w+)', message) or re.search(r'search\s+for\s+(\w+)', message)
+            return 'search', {'name': name_match.group(1)} if name_match else {}
         
         # Species specific
         elif 'dog' in message:
-            return self.get_pets_by_species('dog')
+            return 'species', {'species': 'dog'}
         elif 'cat' in message:
-            return self.get_pets_by_species('cat')
+            return 'species', {'species': 'cat'}
         
         # Behavioral traits
         elif any(word in message for word in ['kids', 'children', 'family']):
-            return self.get_pets_good_with_kids()
+            return 'kids', {}
         
         # Recent activity
         elif any(word in message for word in ['activity', 'recent', 'log']):
-            return self.get_recent_activity()
+            return 'activity', {}
         
         # Help
         elif any(word in message for word in ['help', 'what can you do']):
-            return self.get_help_message()
+            return 'help', {}
         
+        return None, {}
+    
+    def invalidate_cache(self):
+        """Drop cached responses; the app calls this after its own pet writes to free them early"""
+        self.cache.invalidate()
+    
+    def process_message(self, message):
+        return ''.join(self.stream_message(message))
+    
+    def stream_message(self, message):
+        """Yield the response in chunks as rows are read, for streaming clients"""
+        message = message.lower().strip()
+        intent, entities = self.route(message)
+        if intent not in CACHED_INTENTS:
+            yield from self.respond(intent, entities)
+            return
+        
+        # Keyed by the trigger-maintained data version, so writes from other
+        # processes (workers, bulk_import, plain SQL) also retire old answers
+        version = get_data_version(self.get_db_connection())[0]
+        key = (version, intent, tuple(sorted(entities.items())))
+        response = self.cache.get(key)
+        if response is not None:
+            yield response
+            return
+        
+        generation = self.cache.generation
+        chunks = []
+        for chunk in self.respond(intent, entities):
+            chunks.append(chunk)
+            yield chunk
+        # Only reached when the client read the whole response
+        self.cache.set(key, ''.join(chunks), generation)
+    
+    def respond(self, intent, entities):
+        """Return an iterable of response chunks for a routed intent"""
+        if intent == 'search':
+            return self.iter_search_results(entities.get('name'))
+        elif intent == 'species':
+            return self.iter_pets_by_species(entities['species'])
+        elif intent == 'kids':
+            return self.iter_pets_good_with_kids()
+        elif intent == 'available':
+            return self.iter_available_pets()
+        elif intent == 'stats':
+            return [self.get_pet_statistics()]
+        elif intent == 'activity':
+            return self.iter_recent_activity()
+        elif intent == 'help':
+            return [self.get_help_message()]
         else:
-            return "I can help you with pet information! Try asking about available pets, statistics, or search for a specific pet."
+            return ["I can help you with pet information! Try asking about available pets, statistics, or search for a specific pet."]
     
     def get_pet_statistics(self):
         conn = self.get_db_connection()
         
-        total = conn.execute('SELECT COUNT(*) FROM pets').fetchone()[0]
-        available = conn.execute('SELECT COUNT(*) FROM pets WHERE status = "available"').fetchone()[0]
-        dogs = conn.execute('SELECT COUNT(*) FROM pets WHERE species = "dog"').fetchone()[0]
-        cats = conn.execute('SELECT COUNT(*) FROM pets WHERE species = "cat"').fetchone()[0]
+        counts = get_pet_counts(conn)
+        total = counts['total']
+        available = counts['status'].get('available', 0)
+        dogs = counts['species'].get('dog', 0)
+        cats = counts['species'].get('cat', 0)
         
-        conn.close()
         
         return f"""🏠 Shelter Statistics:
 • Total Pets: {total}
@@ -65,92 +129,71 @@ class ShelterChatbot:
 
 Use "Show available pets" to see who's ready for a new home!"""
     
-    def get_available_pets(self):
-        conn = self.get_db_connection()
-        
-        pets = conn.execute('''
-            SELECT * FROM pets 
-            WHERE status = "available" 
-            ORDER BY created_at DESC 
-            LIMIT 10
-        ''').fetchall()
-        conn.close()
+    def iter_available_pets(self):
+        pets = self.catalog.get(self.get_db_connection()).rows[:10]
         
         if not pets:
-            return "No pets are currently available for adoption. Check back soon!"
+            yield "No pets are currently available for adoption. Check back soon!"
+            return
         
-        response = "🐾 Available Pets:\n\n"
+        yield "🐾 Available Pets:\n\n"
         for pet in pets:
-            response += f"• {pet['name']} - {pet['species'].title()} ({pet['breed'] or 'Mixed'}), {pet['age']} years old\n"
-            response += f"  Status: {pet['status'].title()}\n\n"
-        
-        return response
+            yield f"• {pet['name']} - {pet['species'].title()} ({pet['breed'] or 'Mixed'}), {pet['age']} years old\n"
+            yield f"  Status: {pet['status'].title()}\n\n"
     
-    def search_pet_by_name(self, message):
-        name_match = re.search(r'find\s+(\w+)', message) or re.search(r'search\s+for\s+(\w+)', message)
-        if name_match:
-            pet_name = name_match.group(1)
-            
-            conn = self.get_db_connection()
-            pets = conn.execute(
-                'SELECT * FROM pets WHERE name LIKE ?', 
-                (f'%{pet_name}%',)
-            ).fetchall()
-            conn.close()
-            
-            if not pets:
-                return f"No pets found with name containing '{pet_name}'."
-            
-            response = f"🔍 Found {len(pets)} pet(s):\n\n"
-            for pet in pets:
-                response += f"• {pet['name']} - {pet['species'].title()} ({pet['breed'] or 'Mixed'})\n"
-                response += f"  Age: {pet['age']} years, Status: {pet['status'].title()}\n\n"
-            
-            return response
-        
-        return "Who are you looking for? Try 'Find Max' or 'Search for Buddy'"
-    
-    def get_pets_by_species(self, species):
-        conn = self.get_db_connection()
+    def iter_search_results(self, pet_name):
+        if not pet_name:
+            yield "Who are you looking for? Try 'Find Max' or 'Search for Buddy'"
+            return
         
+        # Ranked full-text prefix match on the name
+        conn = self.get_db_connection()
         pets = conn.execute('''
-            SELECT * FROM pets 
-            WHERE species = ? AND status = "available" 
-            ORDER BY name
-        ''', (species,)).fetchall()
-        conn.close()
+            SELECT p.* FROM pets_fts
+            JOIN pets p ON p.id = pets_fts.rowid
+            WHERE pets_fts MATCH ?
+            ORDER BY pets_fts.rank
+            LIMIT ?
+        ''', (fts_query(pet_name, 'name'), self.SEARCH_LIMIT + 1)).fetchall()
         
         if not pets:
-            return f"No available {species}s at the moment."
+            yield f"No pets found with name starting with '{pet_name}'."
+            return
         
-        species_emoji = "🐕" if species == 'dog' else "🐈"
-        response = f"{species_emoji} Available {species.title()}s:\n\n"
+        if len(pets) > self.SEARCH_LIMIT:
+            pets = pets[:self.SEARCH_LIMIT]
+            yield f"🔍 Top {len(pets)} matches:\n\n"
+        else:
+            yield f"🔍 Found {len(pets)} pet(s):\n\n"
         for pet in pets:
-            response += f"• {pet['name']} - {pet['breed'] or 'Mixed'}, {pet['age']} years old\n"
-        
-        return response
+            yield f"• {pet['name']} - {pet['species'].title()} ({pet['breed'] or 'Mixed'})\n"
+            yield f"  Age: {pet['age']} years, Status: {pet['status'].title()}\n\n"
     
-    def get_pets_good_with_kids(self):
-        conn = self.get_db_connection()
+    def iter_pets_by_species(self, species):
+        pets = self.catalog.get(self.get_db_connection()).by_species(species)
         
-        pets = conn.execute('''
-            SELECT * FROM pets 
-            WHERE good_with_kids = 1 AND status = "available" 
-            ORDER BY species, name
-        ''').fetchall()
-        conn.close()
+        if not pets:
+            yield f"No available {species}s at the moment."
+            return
+        
+        species_emoji = "🐕" if species == 'dog' else "🐈"
+        yield f"{species_emoji} Available {species.title()}s:\n\n"
+        for pet in pets:
+            yield f"• {pet['name']} - {pet['breed'] or 'Mixed'}, {pet['age']} years old\n"
+    
+    def iter_pets_good_with_kids(self):
+        pets = self.catalog.get(self.get_db_connection()).good_with_kids
         
         if not pets:
-            return "No pets specifically noted as good with kids are currently available."
+            yield "No pets specifically noted as good with kids are currently available."
+            return
         
-        response = "👶 Pets Good with Kids:\n\n"
+        yield "👶 Pets Good with Kids:\n\n"
         for pet in pets:
             species_emoji = "🐕" if pet['species'] == 'dog' else "🐈"
-            response += f"• {species_emoji} {pet['name']} - {pet['breed'] or 'Mixed'}, {pet['age']} years\n"
-        
-        return response
+            yield f"• {species_emoji} {pet['name']} - {pet['breed'] or 'Mixed'}, {pet['age']} years\n"
     
-    def get_recent_activity(self):
+    def iter_recent_activity(self):
         conn = self.get_db_connection()
         
         logs = conn.execute('''
@@ -160,21 +203,19 @@ Use "Show available pets" to see who's ready for a new home!"""
             ORDER BY al.timestamp DESC 
             LIMIT 5
         ''').fetchall()
-        conn.close()
         
         if not logs:
-            return "No recent activity to show."
+            yield "No recent activity to show."
+            return
         
-        response = "📝 Recent Activity:\n\n"
+        yield "📝 Recent Activity:\n\n"
         for log in logs:
             timestamp = datetime.strptime(log['timestamp'], '%Y-%m-%d %H:%M:%S').strftime('%m/%d')
             action = log['action'].replace('_', ' ').title()
             pet_info = f" ({log['pet_name']})" if log['pet_name'] else ""
-            response += f"• {timestamp}: {action}{pet_info}\n"
+            yield f"• {timestamp}: {action}{pet_info}\n"
             if log['description']:
-                response += f"  {log['description']}\n"
-        
-        return response
+                yield f"  {log['description']}\n"
     
     def get_help_message(self):
         return """🤖 Shelter Assistant Help:
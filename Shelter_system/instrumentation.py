@@ -0,0 +1,339 @@
+"""
+Request and SQL instrumentation for the shelter app
+
+Every request records its latency, the number of SQL statements the app
+ran (each execute or executemany call counts once; statements run by
+triggers do not count) and the time spent inside SQLite calls. A request
+that runs more statements than SQL_QUERY_BUDGET logs a warning. Everything is exposed on
+/metrics in the Prometheus text format.
+
+Two opt-in diagnostics sit on top: SlowQueryLog writes slow statements with
+their query plan to a rotating file, and RequestProfiler returns a cProfile
+dump for a single request.
+"""
+import cProfile
+import functools
+import hmac
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import g, request, Response, has_request_context
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+def _timed(method):
+    """Wrap a Connection method to add its run time to the connection's sql_seconds"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+    return wrapper
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor timing each statement from execute through its last fetch"""
+    sql = None
+    parameters = None
+    many = False
+    statement_seconds = 0.0
+    reported = False
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters, many=False)
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, seq_of_parameters, many=True)
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._run(super().fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._run(super().fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._run(super().fetchall)
+
+    def __next__(self):
+        return self._run(super().__next__)
+
+    def _start(self, sql, parameters, many):
+        self.connection.statements += 1
+        self.sql = sql
+        self.parameters = parameters
+        self.many = many
+        self.statement_seconds = 0.0
+        self.reported = False
+
+    def _run(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            conn = self.connection
+            conn.sql_seconds += elapsed
+            self.statement_seconds += elapsed
+            # Reported once, as soon as the statement crosses the threshold
+            if (conn.slow_query_hook is not None and not self.reported
+                    and self.statement_seconds >= conn.slow_query_seconds):
+                self.reported = True
+                conn.slow_query_hook(self)
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that adds up the time spent executing and fetching
+
+    Set slow_query_hook to be called with the cursor of any statement that
+    takes longer than slow_query_seconds.
+    """
+    slow_query_hook = None
+    slow_query_seconds = 0.1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sql_seconds = 0.0
+        self.statements = 0
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The C implementations of these shortcuts create a plain cursor, which
+    # would bypass the timing
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+    commit = _timed(sqlite3.Connection.commit)
+
+class Histogram:
+    """Cumulative Prometheus histogram for one label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+class Metrics:
+    """Per-endpoint request metrics, registered on a Flask app with init_app()"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.sql_time = {}
+        self.requests = {}
+        self.budget_exceeded = {}
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_QUERY_BUDGET', 50)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        self.app = app
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+
+    def _after_request(self, response):
+        g.response_status = response.status_code
+        return response
+
+    def _teardown_request(self, exception):
+        if 'request_started' not in g:
+            return
+        elapsed = time.perf_counter() - g.request_started
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        status = g.get('response_status', 500)
+        db = g.get('db')
+        queries = getattr(db, 'statements', 0)
+        sql_seconds = getattr(db, 'sql_seconds', 0.0)
+
+        key = (endpoint, method)
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(queries)
+            self.sql_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(sql_seconds)
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+
+        budget = self.app.config['SQL_QUERY_BUDGET']
+        if budget and queries > budget:
+            with self._lock:
+                self.budget_exceeded[key] = self.budget_exceeded.get(key, 0) + 1
+            self.app.logger.warning(
+                '%s %s ran %d SQL statements (budget %d) in %.1f ms',
+                method, request.path, queries, budget, elapsed * 1000
+            )
+
+    def _histogram_lines(self, name, help_text, histograms):
+        lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (endpoint, method), histogram in sorted(histograms.items()):
+            labels = _labels(endpoint=endpoint, method=method)
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return lines
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = ['# HELP shelter_requests_total Requests by endpoint, method and status',
+                     '# TYPE shelter_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'shelter_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+            lines += self._histogram_lines('shelter_request_duration_seconds',
+                                           'Request latency', self.latency)
+            lines += self._histogram_lines('shelter_request_sql_queries',
+                                           'SQL statements run per request', self.queries)
+            lines += self._histogram_lines('shelter_request_sql_seconds',
+                                           'Time spent in SQLite per request', self.sql_time)
+            lines += ['# HELP shelter_query_budget_exceeded_total Requests over SQL_QUERY_BUDGET',
+                      '# TYPE shelter_query_budget_exceeded_total counter']
+            for (endpoint, method), count in sorted(self.budget_exceeded.items()):
+                lines.append(f'shelter_query_budget_exceeded_total{{{_labels(endpoint=endpoint, method=method)}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+def parameter_shape(parameters, many=False):
+    """Describe bound parameters by type only, so values never reach the log"""
+    if many:
+        if not isinstance(parameters, (list, tuple)):
+            return {'rows': None}
+        return {'rows': len(parameters),
+                'row': parameter_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+class SlowQueryLog:
+    """Writes statements slower than SLOW_QUERY_MS to a rotating JSON-lines file
+
+    Off unless SLOW_QUERY_LOG names the file. Each entry has the statement,
+    the shape of its parameters, its elapsed time and its query plan.
+    """
+
+    def __init__(self):
+        self.logger = None
+        self.threshold = None
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_LOG', None)
+        app.config.setdefault('SLOW_QUERY_MS', 100)
+        app.config.setdefault('SLOW_QUERY_LOG_MAX_BYTES', 5 * 1024 * 1024)
+        app.config.setdefault('SLOW_QUERY_LOG_BACKUPS', 3)
+        path = app.config['SLOW_QUERY_LOG']
+        if not path:
+            return
+
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000
+        self.logger = logging.getLogger('shelter.slow_queries')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = RotatingFileHandler(path, maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                                      backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+
+    def track_connection(self, conn):
+        if self.logger is not None:
+            conn.slow_query_hook = self._record
+            conn.slow_query_seconds = self.threshold
+
+    def _record(self, cursor):
+        plan = None
+        if not cursor.many:
+            try:
+                # A plain cursor, so explaining is neither timed nor reported
+                plan = [row[3] for row in cursor.connection.cursor(sqlite3.Cursor).execute(
+                    f'EXPLAIN QUERY PLAN {cursor.sql}', cursor.parameters
+                )]
+            except sqlite3.Error:
+                pass
+
+        self.logger.info(json.dumps({
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'elapsed_ms': round(cursor.statement_seconds * 1000, 2),
+            'sql': ' '.join(cursor.sql.split()),
+            'parameters': parameter_shape(cursor.parameters, cursor.many),
+            'plan': plan
+        }))
+
+class RequestProfiler:
+    """Runs one request under cProfile and returns the stats as a download
+
+    Off unless PROFILE_TOKEN is set. A request carrying that token in the
+    X-Profile header or the ?_profile= argument is executed normally, its
+    body generated in full, and the response replaced by a .prof file
+    (open it with `python -m pstats` or snakeviz).
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILE_TOKEN', None)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self.app = app
+
+    def _requested(self):
+        token = self.app.config['PROFILE_TOKEN']
+        if not token:
+            return False
+        given = request.headers.get('X-Profile') or request.args.get('_profile')
+        return given is not None and hmac.compare_digest(given, token)
+
+    def _before_request(self):
+        if not self._requested():
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active in this interpreter
+            return Response('Another request is being profiled\n', status=409, mimetype='text/plain')
+        g.profiler = profiler
+        return None
+
+    def _after_request(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        # Generate streamed bodies too, so their cost is part of the profile
+        response.get_data()
+        profiler.disable()
+
+        with tempfile.NamedTemporaryFile(suffix='.prof') as dump:
+            profiler.dump_stats(dump.name)
+            stats = dump.read()
+        filename = f"profile-{request.endpoint or 'unmatched'}-{datetime.now():%Y%m%d%H%M%S}.prof"
+        profiled = Response(stats, mimetype='application/octet-stream')
+        profiled.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        return profiled
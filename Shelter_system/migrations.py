@@ -0,0 +1,318 @@
+"""
+Versioned schema migrations for the shelter database
+
+The schema version is stored in SQLite's PRAGMA user_version. Each entry in
+MIGRATIONS is applied once, in order, inside its own transaction.
+"""
+import sys
+
+from models import connect_db
+
+def _data_version_triggers():
+    """Triggers that bump data_version on every write that can change a catalog response"""
+    events = [(table, event, '') for table in ('pets', 'pet_images')
+              for event in ('INSERT', 'UPDATE', 'DELETE')]
+    # Shelter name and email are joined into the API payload
+    events.append(('users', 'UPDATE', ' OF full_name, email'))
+    return [f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()} AFTER {event}{columns} ON {table}
+        BEGIN
+            UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        ''' for table, event, columns in events]
+
+# (version, description, statements)
+MIGRATIONS = [
+    (1, 'Indexes for status filters, image lookups and activity logs', [
+        'CREATE INDEX IF NOT EXISTS idx_pets_status_created ON pets (status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_pets_species_status ON pets (species, status)',
+        'CREATE INDEX IF NOT EXISTS idx_pet_images_pet_primary ON pet_images (pet_id, is_primary)',
+        'CREATE INDEX IF NOT EXISTS idx_activity_logs_pet_timestamp ON activity_logs (pet_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp ON activity_logs (timestamp)',
+    ]),
+    (2, 'Pet counters per species and status, maintained by triggers', [
+        '''
+        CREATE TABLE IF NOT EXISTS pet_counters (
+            species TEXT NOT NULL,
+            status TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (species, status)
+        ) WITHOUT ROWID
+        ''',
+        'DELETE FROM pet_counters',
+        '''
+        INSERT INTO pet_counters (species, status, total)
+        SELECT species, COALESCE(status, ''), COUNT(*) FROM pets GROUP BY 1, 2
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_counters_insert AFTER INSERT ON pets
+        BEGIN
+            INSERT INTO pet_counters (species, status, total)
+            VALUES (NEW.species, COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (species, status) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_counters_update AFTER UPDATE OF species, status ON pets
+        WHEN OLD.species IS NOT NEW.species OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE pet_counters SET total = total - 1
+            WHERE species = OLD.species AND status = COALESCE(OLD.status, '');
+            INSERT INTO pet_counters (species, status, total)
+            VALUES (NEW.species, COALESCE(NEW.status, ''), 1)
+            ON CONFLICT (species, status) DO UPDATE SET total = total + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_counters_delete AFTER DELETE ON pets
+        BEGIN
+            UPDATE pet_counters SET total = total - 1
+            WHERE species = OLD.species AND status = COALESCE(OLD.status, '');
+        END
+        ''',
+    ]),
+    # Single-row counter bumped on every catalog write, used for HTTP
+    # validators (ETag/Last-Modified) and cache invalidation
+    (3, 'Data version counter for pets and pet_images', [
+        '''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL
+        )
+        ''',
+        "INSERT OR IGNORE INTO data_version (id, version, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)",
+    ] + _data_version_triggers()),
+    # Append-only change feed so consumers can sync deltas instead of re-reading
+    (4, 'Pet change log for incremental catalog sync', [
+        '''
+        CREATE TABLE IF NOT EXISTS pet_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            pet_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_changes_insert AFTER INSERT ON pets
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (NEW.id, 'insert');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_changes_update AFTER UPDATE ON pets
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (NEW.id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_changes_delete AFTER DELETE ON pets
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (OLD.id, 'delete');
+        END
+        ''',
+        # An image change alters the pet's primary_image, so it counts as an update
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pet_images_changes_insert AFTER INSERT ON pet_images
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (NEW.pet_id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pet_images_changes_update AFTER UPDATE ON pet_images
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (NEW.pet_id, 'update');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pet_images_changes_delete AFTER DELETE ON pet_images
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation) VALUES (OLD.pet_id, 'update');
+        END
+        ''',
+    ]),
+    # External-content FTS5 index, so text search no longer scans with LIKE '%x%'
+    (5, 'Full-text search index over pet name, breed, description and special needs', [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS pets_fts USING fts5(
+            name, breed, description, special_needs,
+            content='pets', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        "INSERT INTO pets_fts (pets_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_fts_insert AFTER INSERT ON pets
+        BEGIN
+            INSERT INTO pets_fts (rowid, name, breed, description, special_needs)
+            VALUES (NEW.id, NEW.name, NEW.breed, NEW.description, NEW.special_needs);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_fts_update AFTER UPDATE OF name, breed, description, special_needs ON pets
+        BEGIN
+            INSERT INTO pets_fts (pets_fts, rowid, name, breed, description, special_needs)
+            VALUES ('delete', OLD.id, OLD.name, OLD.breed, OLD.description, OLD.special_needs);
+            INSERT INTO pets_fts (rowid, name, breed, description, special_needs)
+            VALUES (NEW.id, NEW.name, NEW.breed, NEW.description, NEW.special_needs);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_pets_fts_delete AFTER DELETE ON pets
+        BEGIN
+            INSERT INTO pets_fts (pets_fts, rowid, name, breed, description, special_needs)
+            VALUES ('delete', OLD.id, OLD.name, OLD.breed, OLD.description, OLD.special_needs);
+        END
+        ''',
+    ]),
+    # AUTOINCREMENT ids are assigned under SQLite's write lock and never
+    # reused, so they are unique and increasing across worker processes
+    (6, 'Adoption applications received from the adoption portal', [
+        '''
+        CREATE TABLE IF NOT EXISTS adoption_applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pet_id INTEGER NOT NULL,
+            pet_name TEXT,
+            applicant_name TEXT NOT NULL,
+            applicant_email TEXT NOT NULL,
+            applicant_phone TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_adoption_applications_pet ON adoption_applications (pet_id, id)',
+        'CREATE INDEX IF NOT EXISTS idx_adoption_applications_status ON adoption_applications (status, id)',
+    ]),
+    # The seven boolean columns packed into one integer (bit order as in
+    # catalog.BOOL_FIELDS). VIRTUAL, so it costs no storage, can never drift
+    # from the columns, and only its index entries are written
+    (7, 'Pet trait bitmask for compatibility queries', [
+        '''
+        ALTER TABLE pets ADD COLUMN traits INTEGER GENERATED ALWAYS AS (
+            (COALESCE(vaccinated, 0) != 0)
+            | ((COALESCE(spayed_neutered, 0) != 0) << 1)
+            | ((COALESCE(microchipped, 0) != 0) << 2)
+            | ((COALESCE(good_with_kids, 0) != 0) << 3)
+            | ((COALESCE(good_with_pets, 0) != 0) << 4)
+            | ((COALESCE(good_with_dogs, 0) != 0) << 5)
+            | ((COALESCE(good_with_cats, 0) != 0) << 6)
+        ) VIRTUAL
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_pets_status_traits ON pets (status, traits)',
+    ]),
+    # Shelter name and email are part of every pet payload, so a change to
+    # them is an update of each pet the user created
+    (8, 'Log shelter user name and email changes in the pet change feed', [
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_users_changes_update AFTER UPDATE OF full_name, email ON users
+        WHEN OLD.full_name IS NOT NEW.full_name OR OLD.email IS NOT NEW.email
+        BEGIN
+            INSERT INTO pet_changes (pet_id, operation)
+            SELECT id, 'update' FROM pets WHERE created_by = NEW.id;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_pets_created_by ON pets (created_by)',
+    ]),
+    # The unfiltered pet list and the dashboard show the newest pets first;
+    # id breaks ties between pets created in the same second
+    (9, 'Index for newest-first pet listings', [
+        'CREATE INDEX IF NOT EXISTS idx_pets_created_id ON pets (created_at, id)',
+    ]),
+    # Saving a user rewrites every column, so the migration-3 trigger bumped
+    # the version (and retired every ETag and catalog snapshot) on each save
+    (10, 'Only bump the data version when a shelter name or email changes', [
+        'DROP TRIGGER IF EXISTS trg_users_version_update',
+        '''
+        CREATE TRIGGER trg_users_version_update AFTER UPDATE OF full_name, email ON users
+        WHEN OLD.full_name IS NOT NEW.full_name OR OLD.email IS NOT NEW.email
+        BEGIN
+            UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+        END
+        ''',
+    ]),
+]
+
+# Hot queries and the index each one is expected to use
+QUERY_PLAN_CHECKS = [
+    ('available pets by date',
+     'SELECT * FROM pets WHERE status = ? ORDER BY created_at DESC', ('available',),
+     'idx_pets_status_created'),
+    ('pets by species and status',
+     'SELECT * FROM pets WHERE species = ? AND status = ?', ('dog', 'available'),
+     'idx_pets_species_status'),
+    ('primary image for a pet',
+     'SELECT image_url FROM pet_images WHERE pet_id = ? AND is_primary = 1', (1,),
+     'idx_pet_images_pet_primary'),
+    ('activity for a pet',
+     'SELECT * FROM activity_logs WHERE pet_id = ? ORDER BY timestamp DESC', (1,),
+     'idx_activity_logs_pet_timestamp'),
+    ('recent activity',
+     'SELECT * FROM activity_logs ORDER BY timestamp DESC LIMIT 5', (),
+     'idx_activity_logs_timestamp'),
+    ('applications for a pet',
+     'SELECT * FROM adoption_applications WHERE pet_id = ? ORDER BY id DESC', (1,),
+     'idx_adoption_applications_pet'),
+    ('applications by status',
+     'SELECT * FROM adoption_applications WHERE status = ? ORDER BY id DESC', ('pending',),
+     'idx_adoption_applications_status'),
+    ('available pets with traits',
+     'SELECT id FROM pets WHERE status = ? AND (traits & ?) = ?', ('available', 9, 9),
+     'idx_pets_status_traits'),
+    ('newest pets',
+     'SELECT * FROM pets ORDER BY created_at DESC, id DESC LIMIT 20', (),
+     'idx_pets_created_id'),
+]
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Apply every migration newer than the database's schema version"""
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+
+        # BEGIN IMMEDIATE takes the write lock up front, so when several
+        # workers start at once only one of them applies each migration
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        print(f"✅ Applied migration {version}: {description}")
+        applied.append(version)
+    return applied
+
+def explain_query_plan(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN details for a statement"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+def check_query_plans(conn):
+    """Return (name, plan) for every hot query that no longer uses its index"""
+    failures = []
+    for name, sql, params, index in QUERY_PLAN_CHECKS:
+        plan = explain_query_plan(conn, sql, params)
+        if not any(index in detail for detail in plan):
+            failures.append((name, plan))
+    return failures
+
+if __name__ == '__main__':
+    db_path = sys.argv[1] if len(sys.argv) > 1 else 'instance/shelter.db'
+    conn = connect_db(db_path)
+    migrate(conn)
+    print(f"Schema version: {get_schema_version(conn)}")
+
+    failures = check_query_plans(conn)
+    for name, plan in failures:
+        print(f"❌ {name} is not using its index: {plan}")
+    conn.close()
+    sys.exit(1 if failures else 0)
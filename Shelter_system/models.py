@@ -1,14 +1,79 @@
+import re
 import sqlite3
+import threading
 from datetime import datetime
 
+# Applied to every connection. WAL lets readers run alongside a writer,
+# busy_timeout makes writers wait for the lock instead of failing with
+# "database is locked", and the mmap/cache sizes keep hot pages in memory.
+SQLITE_PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),  # negative means KiB, so ~16 MB
+]
+
+def connect_db(db_path, factory=sqlite3.Connection):
+    """Open a connection to the shelter database with the tuned pragmas applied"""
+    conn = sqlite3.connect(db_path, factory=factory)
+    conn.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def get_pet_counts(conn):
+    """Read pet totals from the trigger-maintained pet_counters table
+    
+    Returns {'total': n, 'status': {status: n}, 'species': {species: n}}
+    without scanning the pets table.
+    """
+    counts = {'total': 0, 'status': {}, 'species': {}}
+    for row in conn.execute('SELECT species, status, total FROM pet_counters WHERE total != 0'):
+        counts['total'] += row['total']
+        counts['status'][row['status']] = counts['status'].get(row['status'], 0) + row['total']
+        counts['species'][row['species']] = counts['species'].get(row['species'], 0) + row['total']
+    return counts
+
+def fts_query(text, column=None):
+    """Build a pets_fts MATCH expression for free text, prefix-matching every word
+    
+    Words are quoted so user input can never be parsed as FTS5 syntax.
+    Returns None when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    expression = ' AND '.join(f'"{word}"*' for word in words)
+    return f'{column} : ({expression})' if column else expression
+
+def get_data_version(conn):
+    """Return (version, updated_at) of the pets/pet_images data
+    
+    The version is bumped by triggers on every write, so it changes whenever
+    any catalog response could change.
+    """
+    row = conn.execute('SELECT version, updated_at FROM data_version WHERE id = 1').fetchone()
+    return row['version'], row['updated_at']
+
 class Database:
+    """Hands out one reusable connection per thread"""
     def __init__(self, db_path):
         self.db_path = db_path
+        self._local = threading.local()
     
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect_db(self.db_path)
+            self._local.conn = conn
         return conn
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
 
 class PetModel:
     def __init__(self, db):
@@ -17,13 +82,11 @@ class PetModel:
     def get_all_pets(self):
         conn = self.db.get_connection()
         pets = conn.execute('SELECT * FROM pets ORDER BY created_at DESC').fetchall()
-        conn.close()
         return [dict(pet) for pet in pets]
     
     def get_pet_by_id(self, pet_id):
         conn = self.db.get_connection()
         pet = conn.execute('SELECT * FROM pets WHERE id = ?', (pet_id,)).fetchone()
-        conn.close()
         return dict(pet) if pet else None
     
     def add_pet(self, pet_data):
@@ -38,7 +101,6 @@ class PetModel:
         ))
         pet_id = cursor.lastrowid
         conn.commit()
-        conn.close()
         return pet_id
     
     def update_pet(self, pet_id, pet_data):
@@ -53,10 +115,8 @@ class PetModel:
             pet_data.get('description', ''), pet_id
         ))
         conn.commit()
-        conn.close()
     
     def delete_pet(self, pet_id):
         conn = self.db.get_connection()
         conn.execute('DELETE FROM pets WHERE id = ?', (pet_id,))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        conn.commit()
\ No newline at end of file
@@ -1,30 +1,39 @@
 """
-Populate shelter system with user data
+Populate shelter system with user data, and optionally a synthetic load fixture
+
+With no options only the staff accounts below are created. With --users,
+--pets and friends a deterministic synthetic dataset is generated on top:
+the same seed always produces the same rows, so timings and query plans can
+be compared between runs and machines. Rows are generated lazily and
+inserted with executemany, CHUNK_SIZE pets (with their images and
+activity) per transaction; about a million rows take some ten seconds.
+
+Usage: python populate.py [--users 1000 --pets 100000 --seed 42] [--db path]
 """
-import sys
-import os
-import sqlite3
+import argparse
 import hashlib
-from datetime import datetime
+import random
+import time
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate, islice, permutations
+
+from bulk_import import PET_COLUMNS as IMPORT_COLUMNS, insert_pets
+from models import connect_db
 
-def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect('instance/shelter.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+CHUNK_SIZE = 50000
 
 def hash_password(password):
     """Hash a password for storing."""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def check_user_exists(username, email):
+def check_user_exists(conn, username, email):
     """Check if a user already exists"""
-    conn = get_db_connection()
     user = conn.execute(
         'SELECT id FROM users WHERE username = ? OR email = ?', 
         (username, email)
     ).fetchone()
-    conn.close()
     return user is not None
 
 # User data to populate
@@ -59,19 +68,17 @@ USERS = [
     }
 ]
 
-def populate_users():
+def populate_users(conn):
     """Populate database with user data"""
     print("\n=== Populating Shelter with User Data ===")
     
-    conn = get_db_connection()
-    
     try:
         users_created = 0
         users_skipped = 0
         
         for user_data in USERS:
             # Check if user already exists
-            if check_user_exists(user_data['username'], user_data['email']):
+            if check_user_exists(conn, user_data['username'], user_data['email']):
                 print(f"⚠ User {user_data['username']} already exists, skipping...")
                 users_skipped += 1
                 continue
@@ -107,8 +114,239 @@ def populate_users():
     except Exception as e:
         print(f"❌ Error populating users: {e}")
         conn.rollback()
+
+# Synthetic dataset. Weights are rough proportions for a mid-sized shelter.
+FIRST_NAMES = ['Maria', 'Jose', 'Ana', 'Juan', 'Liza', 'Mark', 'Grace', 'Paolo', 'Jessa', 'Carlo',
+               'Emma', 'Noah', 'Olivia', 'Liam', 'Sofia', 'Ethan', 'Mia', 'Lucas', 'Chloe', 'Ryan']
+LAST_NAMES = ['Santos', 'Reyes', 'Cruz', 'Bautista', 'Garcia', 'Mendoza', 'Torres', 'Flores',
+              'Smith', 'Johnson', 'Brown', 'Lee', 'Tan', 'Lim', 'Walker', 'Young']
+PET_NAMES = ['Max', 'Bella', 'Buddy', 'Luna', 'Charlie', 'Lucy', 'Rocky', 'Daisy', 'Milo', 'Coco',
+             'Bantay', 'Muning', 'Choco', 'Brownie', 'Princess', 'Shadow', 'Oreo', 'Ginger',
+             'Simba', 'Nala', 'Tiger', 'Mochi', 'Peanut', 'Pepper', 'Snow', 'Kitkat', 'Toby', 'Ruby']
+SPECIES_WEIGHTS = {'dog': 55, 'cat': 45}
+BREED_WEIGHTS = {
+    'dog': {'Aspin': 30, 'Mixed': 20, 'Labrador Retriever': 8, 'Shih Tzu': 8, 'Pit Bull Terrier': 7,
+            'Chihuahua': 7, 'German Shepherd': 6, 'Beagle': 5, 'Golden Retriever': 5, 'Poodle': 4},
+    'cat': {'Puspin': 35, 'Domestic Shorthair': 30, 'Domestic Longhair': 10, 'Siamese': 8,
+            'Persian': 7, 'Tabby': 6, 'Maine Coon': 4},
+}
+STATUS_WEIGHTS = {'available': 55, 'pending': 10, 'adopted': 35}
+ENERGY_WEIGHTS = {'low': 25, 'medium': 45, 'high': 25, '': 5}
+# Most intakes are young; index is the age in years
+AGE_WEIGHTS = [14, 16, 13, 11, 9, 8, 7, 6, 5, 4, 3, 2, 1, 1, 0.5, 0.5]
+# Images per pet, index is the count
+IMAGE_COUNT_WEIGHTS = [5, 35, 30, 20, 10]
+TRAITS = ['playful', 'gentle', 'shy at first', 'house-trained', 'loves walks', 'calm',
+          'curious', 'affectionate', 'independent', 'good on a leash']
+TRAIT_PAIRS = [f'{first}, {second}' for first, second in permutations(TRAITS, 2)]
+GENDERS = ('male', 'female')
+SPECIAL_NEEDS = ['Needs daily medication', 'Partially blind', 'Missing a leg', 'Special diet']
+ACTIVITY = [
+    ('updated', 'Updated pet information'),
+    ('status_update', 'Status changed to {status}'),
+    ('application', 'Adoption application received for {name}'),
+]
+
+# Timestamps are spread over HISTORY_DAYS before END_DATE. A fixed end date,
+# rather than now, keeps the same seed producing the same rows.
+END_DATE = datetime(2025, 1, 1)
+HISTORY_DAYS = 730
+
+# Generated rows also carry their history dates
+PET_COLUMNS = IMPORT_COLUMNS + ['created_at', 'intake_date']
+PET_NAME = PET_COLUMNS.index('name')
+PET_STATUS = PET_COLUMNS.index('status')
+PET_CREATED_BY = PET_COLUMNS.index('created_by')
+PET_CREATED_AT = PET_COLUMNS.index('created_at')
+
+class Weighted:
+    """Draws from a {value: weight} mapping (or a list weighted by index)"""
+
+    def __init__(self, rng, weights):
+        if isinstance(weights, dict):
+            self.values, weights = list(weights), list(weights.values())
+        else:
+            self.values = list(range(len(weights)))
+        self.cum_weights = list(accumulate(weights))
+        self.total = self.cum_weights[-1]
+        self.random = rng.random
+
+    def __call__(self):
+        # rng.choices() does the same, with several times the overhead per call
+        return self.values[bisect(self.cum_weights, self.random() * self.total)]
+
+def _pick(rng, values):
+    """Uniform choice; a fraction of rng.choice()'s cost, with negligible bias for short lists"""
+    return values[int(rng.random() * len(values))]
+
+def _timestamp(moment):
+    """Format like SQLite's CURRENT_TIMESTAMP"""
+    return moment.isoformat(sep=' ', timespec='seconds')
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def generate_users(rng, count, first_id):
+    """User rows for INSERT INTO users; every generated account uses 'password123'"""
+    password_hash = hash_password('password123')
+    role = Weighted(rng, {'staff': 95, 'admin': 5})
+    for number in range(first_id, first_id + count):
+        full_name = f'{_pick(rng, FIRST_NAMES)} {_pick(rng, LAST_NAMES)}'
+        yield (f'user{number}', password_hash, f'user{number}@example.com', full_name, role(), 1)
+
+def generate_pets(rng, count, user_ids, start, end):
+    """Pet rows for INSERT INTO pets, with created_at increasing like real intake"""
+    species_of = Weighted(rng, SPECIES_WEIGHTS)
+    breed_of = {species: Weighted(rng, weights) for species, weights in BREED_WEIGHTS.items()}
+    status_of = Weighted(rng, STATUS_WEIGHTS)
+    energy_of = Weighted(rng, ENERGY_WEIGHTS)
+    age_of = Weighted(rng, AGE_WEIGHTS)
+    step = (end - start) / max(count, 1)
+
+    for number in range(count):
+        species = species_of()
+        breed = breed_of[species]()
+        created_at = start + step * number + timedelta(seconds=rng.random() * step.total_seconds())
+        yield (
+            _pick(rng, PET_NAMES), species, breed, age_of(), _pick(rng, GENDERS),
+            status_of(), f'A {_pick(rng, TRAIT_PAIRS)} {breed.lower()} looking for a home.',
+            int(rng.random() < 0.8), int(rng.random() < 0.6), int(rng.random() < 0.5),
+            _pick(rng, SPECIAL_NEEDS) if rng.random() < 0.05 else '',
+            int(rng.random() < 0.75), int(rng.random() < 0.7), int(rng.random() < 0.7),
+            int(rng.random() < (0.4 if species == 'dog' else 0.8)),
+            energy_of(), '', _pick(rng, user_ids),
+            _timestamp(created_at), created_at.date().isoformat()
+        )
+
+def generate_images(rng, pets):
+    """pet_images rows for (pet_id, pet row) pairs; about one pet in ten has no primary image"""
+    image_count = Weighted(rng, IMAGE_COUNT_WEIGHTS)
+    for pet_id, pet in pets:
+        has_primary = rng.random() < 0.9
+        for number in range(image_count()):
+            yield (pet_id, f'/static/uploads/pet_{pet_id}_{number}.jpg', f'Photo {number + 1}',
+                   int(has_primary and number == 0), pet[PET_CREATED_AT])
+
+def generate_activity(rng, pets, user_ids, per_pet, end):
+    """activity_logs rows: an 'added' entry, then a history ending in the pet's status"""
+    for pet_id, pet in pets:
+        name, status = pet[PET_NAME], pet[PET_STATUS]
+        created_at = datetime.fromisoformat(pet[PET_CREATED_AT])
+        span = (end - created_at).total_seconds()
+        entries = int(rng.random() * (2 * max(per_pet - 1, 0) + 1))
+        times = sorted(rng.random() * span for _ in range(entries))
+
+        yield (pet_id, pet[PET_CREATED_BY], 'added', 'Added new pet to system', pet[PET_CREATED_AT])
+        for number, offset in enumerate(times, 1):
+            if number == len(times) and status == 'adopted':
+                action, description = 'adopted', f'Pet {name} adopted'
+            else:
+                action, description = _pick(rng, ACTIVITY)
+                description = description.format(name=name, status=status)
+            yield (pet_id, _pick(rng, user_ids), action, description,
+                   _timestamp(created_at + timedelta(seconds=offset)))
+
+@contextmanager
+def _suspended_triggers(conn, *names):
+    """Drop triggers for the duration of the block and recreate them after it
+
+    Must run inside a transaction, so no other connection ever sees the
+    schema without them.
+    """
+    placeholders = ', '.join('?' * len(names))
+    definitions = [row[0] for row in conn.execute(
+        f"SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})", names
+    )]
+    for name in names:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    try:
+        yield
     finally:
-        conn.close()
+        for definition in definitions:
+            conn.execute(definition)
+
+def generate_dataset(conn, users=0, pets=0, activity_per_pet=6, seed=42,
+                     end=END_DATE, chunk_size=CHUNK_SIZE):
+    """Insert a deterministic synthetic dataset and return the row counts per table
+
+    Users are inserted first; then pets CHUNK_SIZE at a time, each chunk in
+    one transaction together with its images and activity history.
+
+    The per-row triggers dominate insert time, so two are suspended per
+    chunk: the FTS index is filled with one INSERT ... SELECT instead, and
+    images need no change feed or data_version entries of their own, since
+    their pets are inserted (and logged) in the same transaction. Counters,
+    the pet change feed and the data version are maintained as usual.
+    """
+    rng = random.Random(seed)
+    start = end - timedelta(days=HISTORY_DAYS)
+    counts = {'users': 0, 'pets': 0, 'pet_images': 0, 'activity_logs': 0}
+
+    conn.execute('BEGIN IMMEDIATE')
+    first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()[0]
+    for chunk in _chunks(generate_users(rng, users, first_id), chunk_size):
+        conn.executemany('''
+            INSERT INTO users (username, password_hash, email, full_name, role, is_active)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', chunk)
+        counts['users'] += len(chunk)
+    conn.commit()
+
+    user_ids = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY id')]
+    for chunk in _chunks(generate_pets(rng, pets, user_ids, start, end), chunk_size):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            with _suspended_triggers(conn, 'trg_pets_fts_insert'):
+                pet_ids = insert_pets(conn, chunk, PET_COLUMNS)
+                conn.execute('''
+                    INSERT INTO pets_fts (rowid, name, breed, description, special_needs)
+                    SELECT id, name, breed, description, special_needs FROM pets WHERE id >= ?
+                ''', (pet_ids[0],))
+            chunk_pets = list(zip(pet_ids, chunk))
+
+            with _suspended_triggers(conn, 'trg_pet_images_changes_insert', 'trg_pet_images_version_insert'):
+                cursor = conn.executemany('''
+                    INSERT INTO pet_images (pet_id, image_url, caption, is_primary, uploaded_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', generate_images(rng, chunk_pets))
+                counts['pet_images'] += cursor.rowcount
+            cursor = conn.executemany('''
+                INSERT INTO activity_logs (pet_id, user_id, action, description, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            ''', generate_activity(rng, chunk_pets, user_ids, activity_per_pet, end))
+            counts['activity_logs'] += cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        counts['pets'] += len(chunk)
+    return counts
 
 if __name__ == '__main__':
-    populate_users()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='instance/shelter.db', help='Shelter database path')
+    parser.add_argument('--users', type=int, default=0, help='Synthetic users to generate')
+    parser.add_argument('--pets', type=int, default=0, help='Synthetic pets to generate')
+    parser.add_argument('--activity-per-pet', type=int, default=6,
+                        help='Average activity log entries per pet')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+    parser.add_argument('--end-date', type=datetime.fromisoformat, default=END_DATE,
+                        help=f'Latest generated timestamp (default: {END_DATE.date()})')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Pets per transaction')
+    args = parser.parse_args()
+
+    conn = connect_db(args.db)
+    populate_users(conn)
+
+    if args.users or args.pets:
+        print(f"=== Generating synthetic data (seed {args.seed}) ===")
+        started = time.perf_counter()
+        counts = generate_dataset(conn, args.users, args.pets, args.activity_per_pet,
+                                  args.seed, args.end_date, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        for table, count in counts.items():
+            print(f"  {table:>14}: {count:,}")
+        print(f"✅ {sum(counts.values()):,} rows in {elapsed:.1f}s")
+    conn.close()
@@ -0,0 +1,141 @@
+"""
+Adoption API checks
+
+Run with: python -m unittest test_adoption_api
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import app as shelter_app
+from models import connect_db
+
+class ShelterTestCase(unittest.TestCase):
+    """Runs each test against a freshly initialised database"""
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        # init_db creates instance/ and static/uploads relative to the cwd
+        os.chdir(self.workdir.name)
+        self.db_path = os.path.join(self.workdir.name, 'instance', 'shelter.db')
+        shelter_app.app.config['DATABASE'] = self.db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            shelter_app.init_db()
+        self.conn = connect_db(self.db_path)
+        self.client = shelter_app.app.test_client()
+
+    def tearDown(self):
+        self.conn.close()
+        shelter_app.activity_log.flush()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def add_pet(self, name, created_at=None, traits=''):
+        pet_id = self.conn.execute(
+            "INSERT INTO pets (name, species, age, gender, status, good_with_kids, created_by) "
+            "VALUES (?, 'dog', 3, 'male', 'available', ?, 1)", (name, 'good_with_kids' in traits)
+        ).lastrowid
+        if created_at != 'now':
+            self.conn.execute('UPDATE pets SET created_at = ? WHERE id = ?', (created_at, pet_id))
+        self.conn.commit()
+        return pet_id
+
+class AdoptionDecisionTests(ShelterTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pet_id = self.add_pet('Rex', 'now')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.applications = [
+                self.client.post('/api/adoption/apply', json={
+                    'pet_id': self.pet_id, 'applicant_name': name, 'applicant_email': f'{name}@example.com'
+                }).get_json()['application_id']
+                for name in ('ann', 'bob', 'cat')
+            ]
+
+    def decide(self, **decision):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.client.post('/api/adoption/update-status',
+                                    json=dict({'pet_id': self.pet_id}, **decision))
+
+    def statuses(self):
+        return dict(self.conn.execute(
+            'SELECT applicant_email, status FROM adoption_applications WHERE pet_id = ?', (self.pet_id,)
+        ).fetchall())
+
+    def test_approval_without_applicant_is_rejected(self):
+        response = self.decide(status='approved', application_id='DJANGO-APP-7')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(self.statuses().values()), {'pending'})
+        pet = self.conn.execute('SELECT status FROM pets WHERE id = ?', (self.pet_id,)).fetchone()
+        self.assertEqual(pet['status'], 'available')
+
+    def test_approval_rejects_competing_applications(self):
+        response = self.decide(status='approved', application_id='DJANGO-APP-7',
+                               applicant_email='bob@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(), {'ann@example.com': 'rejected',
+                                           'bob@example.com': 'approved',
+                                           'cat@example.com': 'rejected'})
+
+    def test_approval_by_shelter_application_id(self):
+        response = self.decide(status='approved', application_id=self.applications[2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses()['cat@example.com'], 'approved')
+
+    def test_rejection_only_rejects_the_applicant(self):
+        response = self.decide(status='rejected', application_id='DJANGO-APP-7',
+                               applicant_email='ann@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(), {'ann@example.com': 'rejected',
+                                           'bob@example.com': 'pending',
+                                           'cat@example.com': 'pending'})
+
+    def test_batch_approval_without_applicant_fails_its_item(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post('/api/adoption/update-status/batch', json={'decisions': [
+                {'pet_id': self.pet_id, 'status': 'approved', 'application_id': 'DJANGO-APP-7'},
+            ]})
+        result = response.get_json()['results'][0]
+        self.assertFalse(result['success'])
+        self.assertEqual(set(self.statuses().values()), {'pending'})
+
+    def test_batch_rejects_a_body_that_is_not_an_object(self):
+        response = self.client.post('/api/adoption/update-status/batch', json=[{'pet_id': self.pet_id}])
+        self.assertEqual(response.status_code, 400)
+
+class KeysetPaginationTests(ShelterTestCase):
+    def setUp(self):
+        super().setUp()
+        # Newest first: ties on created_at are ordered by id, and pets with
+        # no created_at come last
+        pets = [('a', '2024-01-01 10:00:00'), ('b', '2024-01-02 10:00:00'),
+                ('c', '2024-01-02 10:00:00'), ('d', None), ('e', '2024-01-02 10:00:00'),
+                ('f', None), ('g', '2024-01-03 10:00:00')]
+        ids = {name: self.add_pet(name, created_at, traits='good_with_kids') for name, created_at in pets}
+        self.expected = [ids[name] for name in 'gecbafd']
+
+    def walk(self, path, limit):
+        seen = []
+        url = f'{path}limit={limit}'
+        for _ in range(len(self.expected) + 1):
+            page = self.client.get(url).get_json()
+            seen += [pet['id'] for pet in page['results']]
+            if page['next'] is None:
+                return seen
+            url = f"{path}limit={limit}&after={page['next']}"
+        self.fail(f'{path} did not finish: {seen}')
+
+    def test_catalog_walk_covers_null_and_tied_timestamps(self):
+        for limit in (1, 2, 3):
+            self.assertEqual(self.walk('/api/adoption/pets?', limit), self.expected)
+
+    def test_match_walk_covers_null_and_tied_timestamps(self):
+        for limit in (1, 2, 3):
+            self.assertEqual(self.walk('/api/adoption/pets/match?traits=good_with_kids&', limit),
+                             self.expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Schema migration and query plan checks
+
+Run with: python -m unittest test_migrations
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+import app as shelter_app
+from migrations import MIGRATIONS, check_query_plans, get_schema_version, migrate
+from models import connect_db
+
+class MigrationTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        # init_db creates instance/ and static/uploads relative to the cwd
+        os.chdir(self.workdir.name)
+        self.db_path = os.path.join(self.workdir.name, 'instance', 'shelter.db')
+        shelter_app.app.config['DATABASE'] = self.db_path
+        with contextlib.redirect_stdout(io.StringIO()):
+            shelter_app.init_db()
+        self.conn = connect_db(self.db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def test_all_migrations_applied(self):
+        self.assertEqual(get_schema_version(self.conn), MIGRATIONS[-1][0])
+
+    def test_migrate_is_idempotent(self):
+        self.assertEqual(migrate(self.conn), [])
+
+    def test_hot_queries_use_their_indexes(self):
+        self.assertEqual(check_query_plans(self.conn), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,18 +7,18 @@ from .models import UserProfile, ContactMessage, Pet, AdoptionRequest, AdoptionA
 from django.contrib.auth.models import User
 from .shelter_api import shelter_api
 
+# Decisions per request to the shelter's batch endpoint; its ADOPTION_BATCH_MAX
+SHELTER_BATCH_SIZE = 500
+
 # Add this function to admin.py instead of importing from views
 def get_shelter_api_stats():
-    """Get shelter stats directly without circular imports"""
-    import requests
+    """Get shelter stats from the locally synced catalog (only deltas are fetched)"""
     try:
-        response = requests.get("http://localhost:5001/api/adoption/pets", timeout=5)
-        if response.status_code == 200:
-            pets = response.json()
-            pets_count = len(pets) if pets else 0
-            dogs_count = len([p for p in pets if p.get('species') == 'dog']) if pets else 0
-            cats_count = len([p for p in pets if p.get('species') == 'cat']) if pets else 0
-            return pets_count, dogs_count, cats_count
+        pets = shelter_api.get_available_pets()
+        pets_count = len(pets)
+        dogs_count = len([p for p in pets if p.get('species') == 'dog'])
+        cats_count = len([p for p in pets if p.get('species') == 'cat'])
+        return pets_count, dogs_count, cats_count
     except:
         pass
     return 0, 0, 0
@@ -149,17 +149,21 @@ class AdoptionApplicationAdmin(admin.ModelAdmin):
     application_summary.short_description = 'Quick Summary'
 
     def approve_applications(self, request, queryset):
-        for application in queryset:
-            self._send_to_shelter_api(application, 'approved')
+        sent = self._send_batch_to_shelter_api(list(queryset), 'approved')
         updated = queryset.update(status='approved')
-        self.message_user(request, f'{updated} application(s) approved and sent to shelter system!')
+        if sent == updated:
+            self.message_user(request, f'{updated} application(s) approved and sent to shelter system!')
+        else:
+            self.message_user(request, f'{updated} application(s) approved locally; {sent} sent to shelter system.')
     approve_applications.short_description = "Approve selected applications"
 
     def reject_applications(self, request, queryset):
-        for application in queryset:
-            self._send_to_shelter_api(application, 'rejected')
+        sent = self._send_batch_to_shelter_api(list(queryset), 'rejected')
         updated = queryset.update(status='rejected')
-        self.message_user(request, f'{updated} application(s) rejected and notified shelter system.')
+        if sent == updated:
+            self.message_user(request, f'{updated} application(s) rejected and notified shelter system.')
+        else:
+            self.message_user(request, f'{updated} application(s) rejected locally; {sent} notified to shelter system.')
     reject_applications.short_description = "Reject selected applications"
 
     def get_urls(self):
@@ -204,6 +208,54 @@ class AdoptionApplicationAdmin(admin.ModelAdmin):
                 self.message_user(request, 'Application rejected locally but failed to notify shelter system.')
         return redirect('admin:core_adoptionapplication_changelist')
 
+    def _shelter_decision(self, application, action):
+        """Build the shelter API payload for one adoption decision"""
+        return {
+            'pet_id': application.shelter_pet_id,
+            'status': action,
+            'application_id': f'DJANGO-APP-{application.id}',
+            'pet_name': application.pet_name,
+            'applicant_name': application.applicant_name,
+            'applicant_email': application.applicant_email,
+            'decision_date': application.updated_date.isoformat() if application.updated_date else None
+        }
+
+    def _send_batch_to_shelter_api(self, applications, action):
+        """Send the same decision for many applications, SHELTER_BATCH_SIZE per request
+
+        Returns how many of them the shelter system applied.
+        """
+        return sum(self._send_chunk_to_shelter_api(applications[start:start + SHELTER_BATCH_SIZE], action)
+                   for start in range(0, len(applications), SHELTER_BATCH_SIZE))
+
+    def _send_chunk_to_shelter_api(self, applications, action):
+        """Send the same decision for up to SHELTER_BATCH_SIZE applications in one request"""
+        import requests
+
+        if not applications:
+            return 0
+        try:
+            response = requests.post(
+                'http://localhost:5001/api/adoption/update-status/batch',
+                json={'decisions': [self._shelter_decision(application, action)
+                                    for application in applications]},
+                timeout=30
+            )
+            if response.status_code != 200:
+                print(f"Failed to send {action} batch to shelter API. Status: {response.status_code}")
+                return 0
+            results = response.json()['results']
+            for application, result in zip(applications, results):
+                if not result['success']:
+                    print(f"Shelter API rejected {action} for pet {application.shelter_pet_id}: {result.get('error')}")
+            return sum(result['success'] for result in results)
+        except requests.exceptions.RequestException as e:
+            print(f"Error connecting to shelter API: {e}")
+            return 0
+        except Exception as e:
+            print(f"Unexpected error sending to shelter API: {e}")
+            return 0
+
     def _send_to_shelter_api(self, application, action):
         """Send adoption status update to shelter API"""
         import requests
@@ -211,15 +263,7 @@ class AdoptionApplicationAdmin(admin.ModelAdmin):
 
         try:
             # Prepare data for shelter API
-            data = {
-                'pet_id': application.shelter_pet_id,
-                'status': action,
-                'application_id': f'DJANGO-APP-{application.id}',
-                'pet_name': application.pet_name,
-                'applicant_name': application.applicant_name,
-                'applicant_email': application.applicant_email,
-                'decision_date': application.updated_date.isoformat() if application.updated_date else None
-            }
+            data = self._shelter_decision(application, action)
 
             # Send to shelter API
             response = requests.post(
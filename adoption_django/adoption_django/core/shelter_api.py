@@ -1,28 +1,110 @@
 # core/shelter_api.py
+import threading
+from collections import OrderedDict
+
 import requests
 from django.conf import settings
 
+# Most responses kept for revalidation; older URLs are dropped first
+ETAG_CACHE_SIZE = 256
+
 class ShelterAPI:
     def __init__(self):
         self.base_url = "http://localhost:5001/api/adoption"  # Flask app URL
+        # url -> (etag, payload) of the last successful response, least
+        # recently used first
+        self._etag_cache = OrderedDict()
+        self._etag_lock = threading.Lock()
+        # Local copy of the available catalog, kept current from the change feed
+        self._catalog = {}
+        self._catalog_seq = None
+        self._catalog_lock = threading.Lock()
+    
+    def _get_json(self, url):
+        """GET a JSON resource, revalidating the cached copy with If-None-Match
+        
+        Returns the cached payload when the shelter answers 304 Not Modified,
+        or None when the resource could not be fetched.
+        """
+        with self._etag_lock:
+            cached = self._etag_cache.get(url)
+            if cached:
+                self._etag_cache.move_to_end(url)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        if response.status_code == 200:
+            payload = response.json()
+            etag = response.headers.get('ETag')
+            if etag:
+                with self._etag_lock:
+                    self._etag_cache[url] = (etag, payload)
+                    self._etag_cache.move_to_end(url)
+                    while len(self._etag_cache) > ETAG_CACHE_SIZE:
+                        self._etag_cache.popitem(last=False)
+            return payload
+        return None
+    
+    def get_changes(self, since=0, limit=500):
+        """Fetch catalog changes after sequence number `since` from the shelter feed"""
+        response = requests.get(f"{self.base_url}/changes",
+                                params={'since': since, 'limit': limit}, timeout=5)
+        response.raise_for_status()
+        return response.json()
+    
+    def sync_available_pets(self):
+        """Bring the local catalog up to date and return it, newest first
+        
+        The first call downloads the full catalog; later calls only apply the
+        changes recorded since the previous sync.
+        """
+        with self._catalog_lock:
+            while self._catalog_seq is not None:
+                feed = self.get_changes(self._catalog_seq)
+                if feed['latest_seq'] < self._catalog_seq:
+                    # The shelter database was recreated and its feed started
+                    # over, so our position means nothing: read everything again.
+                    # Its data versions restarted too, so old ETags may collide
+                    self._catalog_seq = None
+                    with self._etag_lock:
+                        self._etag_cache.clear()
+                    break
+                for change in feed['changes']:
+                    pet = change['pet']
+                    if pet and pet.get('status') == 'available':
+                        self._catalog[change['pet_id']] = pet
+                    else:
+                        self._catalog.pop(change['pet_id'], None)
+                self._catalog_seq = feed['last_seq']
+                if not feed['has_more']:
+                    break
+            
+            if self._catalog_seq is None:
+                # Remember the feed position before the full read; replaying
+                # changes that the read already saw is harmless
+                latest_seq = self.get_changes(limit=1)['latest_seq']
+                pets = self._get_json(f"{self.base_url}/pets")
+                if pets is None:
+                    # Stay unsynced, so the next call retries the full read
+                    raise ValueError('Could not read the shelter catalog')
+                self._catalog = {pet['id']: pet for pet in pets}
+                self._catalog_seq = latest_seq
+            
+            return sorted(self._catalog.values(),
+                          key=lambda pet: (pet.get('created_at') or '', pet['id']), reverse=True)
     
     def get_available_pets(self):
         """Fetch available pets from shelter system"""
         try:
-            response = requests.get(f"{self.base_url}/pets")
-            if response.status_code == 200:
-                return response.json()
-            return []
-        except requests.exceptions.RequestException:
+            return self.sync_available_pets()
+        except (requests.exceptions.RequestException, ValueError, KeyError):
             return []
     
     def get_pet_details(self, pet_id):
         """Fetch detailed pet information"""
         try:
-            response = requests.get(f"{self.base_url}/pets/{pet_id}")
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self._get_json(f"{self.base_url}/pets/{pet_id}")
         except requests.exceptions.RequestException:
             return None
 